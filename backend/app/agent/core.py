@@ -1,34 +1,35 @@
 """
 Agent Core - Plan-Act-Observe Loop
 """
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
-import json
+from typing import Dict, List, Any, Optional, AsyncIterator, Deque, Tuple
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import asyncio
 
 from app.llm.ollama_client import OllamaClient
-from app.agent.planner import Planner
-from app.agent.parser import ToolCallParser
+from app.mcp.client import MCPClient
+from app.agent.planner import Planner, CONTEXT_WINDOW
+from app.agent.parser import ToolCallParser, ToolCallScanner
 from app.agent.executor import ToolExecutor
 from app.agent.observer import Observer
+from app.config import settings
 
 
-@dataclass
+# Conversations whose recent messages are kept for the planner
+MAX_TRACKED_CONVERSATIONS = 1024
+
+
+@dataclass(slots=True)
 class AgentState:
     """Agent state representation"""
     conversation_id: str
     user_message: str
     plan: Optional[str] = None
-    tool_calls: List[Dict[str, Any]] = None
-    observations: List[str] = None
+    tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+    observations: List[str] = field(default_factory=list)
     final_response: Optional[str] = None
     iteration: int = 0
     max_iterations: int = 5
-    
-    def __post_init__(self):
-        if self.tool_calls is None:
-            self.tool_calls = []
-        if self.observations is None:
-            self.observations = []
 
 
 class Agent:
@@ -39,14 +40,18 @@ class Agent:
     def __init__(
         self,
         llm_client: OllamaClient,
-        max_iterations: int = 5
+        max_iterations: int = 5,
+        mcp_client: Optional[MCPClient] = None
     ):
         self.llm = llm_client
         self.planner = Planner(llm_client)
         self.parser = ToolCallParser()
-        self.executor = ToolExecutor()
+        self.executor = ToolExecutor(mcp_client)
         self.observer = Observer(llm_client)
         self.max_iterations = max_iterations
+        
+        # Last few messages per conversation, seeded from the client context
+        self._recent_context: "OrderedDict[str, Deque[Dict[str, str]]]" = OrderedDict()
     
     async def run(
         self,
@@ -60,56 +65,119 @@ class Agent:
         Args:
             user_message: User's input message
             conversation_id: Unique conversation identifier
-            context: Optional conversation history
+            context: Optional conversation history, only read on the first
+                message of a conversation
             
         Returns:
             Dict containing final response and metadata
         """
+        result: Dict[str, Any] = {}
+        async for event in self.run_stream(user_message, conversation_id, context):
+            if event["type"] == "final":
+                result = event["data"]
+        return result
+    
+    async def run_stream(
+        self,
+        user_message: str,
+        conversation_id: str,
+        context: Optional[List[Dict[str, str]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute the agent loop, yielding progress events
+        
+        Args:
+            Same as run
+            
+        Yields:
+            Events of the form {"type": ..., "data": ...}:
+            - plan_token / observation_token: LLM output deltas
+            - plan: plan text of the current iteration
+            - tool_call: a tool call about to be executed
+            - tool_result: result of a tool call, as soon as it completes
+            - observation: parsed observation of the current iteration
+            - final: the result dict that run() returns
+        """
         state = AgentState(
             conversation_id=conversation_id,
             user_message=user_message,
             max_iterations=self.max_iterations
         )
+        recent = self._get_recent_context(conversation_id, context)
         
         # Agent loop: Plan -> Act -> Observe
         while state.iteration < state.max_iterations:
             state.iteration += 1
             
-            # PLAN: Generate plan and identify tools needed
-            plan_result = await self.planner.create_plan(
-                user_message=state.user_message,
-                context=context,
-                observations=state.observations
-            )
-            
-            state.plan = plan_result.get("plan")
-            
-            # Check if task is complete
-            if plan_result.get("is_complete", False):
-                state.final_response = plan_result.get("response")
-                break
-            
-            # PARSE: Extract tool calls from plan
-            tool_calls = self.parser.parse(plan_result.get("tool_calls", []))
-            
-            if not tool_calls:
-                # No tools needed, generate final response
-                state.final_response = plan_result.get("response")
-                break
-            
-            state.tool_calls.extend(tool_calls)
-            
-            # ACT: Execute tool calls
-            execution_results = await self.executor.execute_tools(tool_calls)
+            # PLAN: Generate plan and identify tools needed; read-only tools
+            # start as soon as the streamed plan has named them
+            plan_result: Dict[str, Any] = {}
+            scanner = ToolCallScanner()
+            started: Dict[Tuple[str, str], asyncio.Task] = {}
+            try:
+                async for event in self.planner.stream_plan(
+                    user_message=state.user_message,
+                    context=recent,
+                    observations=state.observations
+                ):
+                    if event["type"] == "plan":
+                        plan_result = event["data"]
+                    else:
+                        if event["type"] == "plan_token":
+                            self.executor.speculate(
+                                self.parser.parse(scanner.feed(event["data"])),
+                                started
+                            )
+                        yield event
+                
+                state.plan = plan_result.get("plan")
+                yield {"type": "plan", "data": state.plan}
+                
+                # Check if task is complete
+                if plan_result.get("is_complete", False):
+                    state.final_response = plan_result.get("response")
+                    break
+                
+                # PARSE: Extract tool calls from plan
+                tool_calls = self.parser.parse(plan_result.get("tool_calls", []))
+                
+                if not tool_calls:
+                    # No tools needed, generate final response
+                    state.final_response = plan_result.get("response")
+                    break
+                
+                state.tool_calls.extend(tool_calls)
+                
+                for tool_call in tool_calls:
+                    yield {"type": "tool_call", "data": tool_call}
+                
+                # ACT: Execute tool calls, streaming results as they complete
+                execution_results: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
+                async for index, result in self.executor.execute_tools_iter(
+                    tool_calls,
+                    timeout=settings.tool_phase_timeout or None,
+                    started=started
+                ):
+                    execution_results[index] = result
+                    yield {"type": "tool_result", "data": result}
+            finally:
+                # Also reached when planning fails or the consumer disconnects
+                self.executor.cancel_started(started)
             
             # OBSERVE: Process results and decide next action
-            observation = await self.observer.observe(
+            observation: Dict[str, Any] = {}
+            async for event in self.observer.stream_observe(
                 plan=state.plan,
                 tool_calls=tool_calls,
                 execution_results=execution_results
-            )
+            ):
+                if event["type"] == "observation":
+                    observation = event["data"]
+                else:
+                    yield event
             
             state.observations.append(observation)
+            yield {"type": "observation", "data": observation}
             
             # Check if we should continue or finish
             if observation.get("should_finish", False):
@@ -123,11 +191,33 @@ class Agent:
                 "Please try rephrasing your request or breaking it into smaller tasks."
             )
         
-        return {
-            "response": state.final_response,
-            "conversation_id": state.conversation_id,
-            "iterations": state.iteration,
-            "plan": state.plan,
-            "tool_calls": state.tool_calls,
-            "observations": state.observations
+        recent.append({"role": "user", "content": user_message})
+        recent.append({"role": "assistant", "content": state.final_response})
+        
+        yield {
+            "type": "final",
+            "data": {
+                "response": state.final_response,
+                "conversation_id": state.conversation_id,
+                "iterations": state.iteration,
+                "plan": state.plan,
+                "tool_calls": state.tool_calls,
+                "observations": state.observations
+            }
         }
+    
+    def _get_recent_context(
+        self,
+        conversation_id: str,
+        context: Optional[List[Dict[str, str]]]
+    ) -> Deque[Dict[str, str]]:
+        """Bounded recent-message window for a conversation"""
+        recent = self._recent_context.get(conversation_id)
+        if recent is None:
+            recent = deque(context[-CONTEXT_WINDOW:] if context else (), maxlen=CONTEXT_WINDOW)
+            self._recent_context[conversation_id] = recent
+            if len(self._recent_context) > MAX_TRACKED_CONVERSATIONS:
+                self._recent_context.popitem(last=False)
+        else:
+            self._recent_context.move_to_end(conversation_id)
+        return recent
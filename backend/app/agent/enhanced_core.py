@@ -1,31 +1,79 @@
 """
 Enhanced Agent Core - Plan-Act-Observe Loop with Memory Integration
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple, Union
 from dataclasses import dataclass, field
-import json
+import asyncio
+import logging
+import random
 import uuid
 
+from sqlalchemy.orm import Session
+
 from app.llm.ollama_client import OllamaClient
-from app.agent.planner import Planner
-from app.agent.parser import ToolCallParser
-from app.agent.executor import ToolExecutor
+from app.mcp.client import MCPClient
+from app.agent.planner import Planner, format_observation, CONTEXT_WINDOW
+from app.agent.parser import ToolCallParser, ToolCallScanner
+from app.agent.executor import ToolExecutor, READ_ONLY_TOOLS
 from app.agent.observer import Observer
-from app.agent.error_handling import retry_with_backoff, ToolExecutionError, PlanningError
+from app.agent.error_handling import PlanningError, MaxRetriesExceeded
+from app.agent.plan_cache import PlannerCache
 from app.memory.short_term import ShortTermMemory
 from app.memory.long_term import LongTermMemory
 from app.memory.semantic import SemanticMemory
+from app.config import settings
+
+
+log = logging.getLogger(__name__)
+
+# Retry policy for planning
+MAX_RETRIES = 2
+RETRY_INITIAL_DELAY = 1.0
+RETRY_BACKOFF_FACTOR = 2.0
+
+
+def _log_retry(phase: str, attempt: int, max_retries: int, error: Exception) -> None:
+    """Log a retry attempt"""
+    log.warning("⚠️  %s retry %d/%d: %s", phase, attempt, max_retries, error)
 
 
-@dataclass
+async def _none() -> None:
+    """Awaitable placeholder for a skipped lookup"""
+    return None
+
+
+def coerce_conversation_id(conversation_id: Union[str, uuid.UUID]) -> uuid.UUID:
+    """
+    Convert an external conversation identifier to a UUID
+    
+    Args:
+        conversation_id: UUID or string identifier from the API
+        
+    Returns:
+        The parsed UUID, or a stable name-based UUID for non-UUID strings
+    """
+    if isinstance(conversation_id, uuid.UUID):
+        return conversation_id
+    try:
+        return uuid.UUID(conversation_id)
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_OID, conversation_id)
+
+
+@dataclass(slots=True)
 class AgentState:
     """Agent state representation"""
-    conversation_id: str
+    conversation_id: uuid.UUID
+    # The caller's identifier, echoed back and stored unchanged
+    conversation_ref: str = ""
     user_id: str = "default_user"
     user_message: str = ""
     plan: Optional[str] = None
     tool_calls: List[Dict[str, Any]] = field(default_factory=list)
     observations: List[str] = field(default_factory=list)
+    # Observations rendered for the planner prompt, grown one line per
+    # iteration so the prompt prefix stays stable across iterations
+    observations_prompt: str = ""
     final_response: Optional[str] = None
     iteration: int = 0
     max_iterations: int = 5
@@ -42,7 +90,8 @@ class EnhancedAgent:
         self,
         llm_client: OllamaClient,
         max_iterations: int = 5,
-        enable_semantic_memory: bool = True
+        enable_semantic_memory: bool = True,
+        mcp_client: Optional[MCPClient] = None
     ):
         """
         Initialize enhanced agent
@@ -51,27 +100,43 @@ class EnhancedAgent:
             llm_client: Ollama LLM client
             max_iterations: Maximum iterations for agent loop
             enable_semantic_memory: Whether to use semantic memory (RAG)
+            mcp_client: Optional shared MCP client for tool execution
         """
         self.llm = llm_client
         self.planner = Planner(llm_client)
         self.parser = ToolCallParser()
-        self.executor = ToolExecutor()
+        self.executor = ToolExecutor(mcp_client)
         self.observer = Observer(llm_client)
         self.max_iterations = max_iterations
         
         # Initialize memory systems
         self.short_term_memory = ShortTermMemory(max_messages=20)
         self.long_term_memory = LongTermMemory()
-        self.semantic_memory = SemanticMemory() if enable_semantic_memory else None
+        self.semantic_memory = (
+            SemanticMemory(llm_client=llm_client) if enable_semantic_memory else None
+        )
+        
+        # Cache read-only plans for repeated requests, with a similarity tier
+        # when embeddings are available
+        self.plan_cache = PlannerCache(
+            embed_fn=self.semantic_memory.llm_client.embed if self.semantic_memory else None,
+            cacheable_tools=READ_ONLY_TOOLS
+        )
+        
+        # Semantic memory writes are embedded by a background worker,
+        # created on first use since no event loop may be running yet
+        self._semantic_queue: Optional[asyncio.Queue] = None
+        self._semantic_worker: Optional[asyncio.Task] = None
         
-        print("✅ Enhanced Agent initialized with memory systems")
+        log.info("✅ Enhanced Agent initialized with memory systems")
     
     async def run(
         self,
         user_message: str,
-        conversation_id: Optional[str] = None,
+        conversation_id: Optional[Union[str, uuid.UUID]] = None,
         user_id: str = "default_user",
-        use_semantic_memory: bool = True
+        use_semantic_memory: bool = True,
+        db: Optional[Session] = None
     ) -> Dict[str, Any]:
         """
         Execute the enhanced agent loop with memory integration
@@ -81,26 +146,68 @@ class EnhancedAgent:
             conversation_id: Optional conversation identifier
             user_id: User identifier
             use_semantic_memory: Whether to use semantic memory for this query
+            db: Optional request session for persisting the turn; the caller
+                then owns commit and close
             
         Returns:
             Dict containing response and metadata
         """
-        # Generate conversation ID if not provided
-        if not conversation_id:
-            conversation_id = str(uuid.uuid4())
+        result: Dict[str, Any] = {}
+        async for event in self.stream(
+            user_message,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            use_semantic_memory=use_semantic_memory,
+            db=db
+        ):
+            if event["type"] == "final":
+                result = event["data"]
+        return result
+    
+    async def stream(
+        self,
+        user_message: str,
+        conversation_id: Optional[Union[str, uuid.UUID]] = None,
+        user_id: str = "default_user",
+        use_semantic_memory: bool = True,
+        db: Optional[Session] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute the enhanced agent loop, yielding progress events
+        
+        Args:
+            Same as run
+            
+        Yields:
+            Events of the form {"type": ..., "data": ...}:
+            - plan_token: planner LLM output delta
+            - observation_token: observer LLM output delta
+            - plan_retry: planning failed and restarts (discard plan tokens so far)
+            - plan: plan text of the current iteration
+            - tool_call: a tool call about to be executed
+            - tool_result: result of a tool call, as soon as it completes
+            - observation: observation text of the current iteration
+            - final: the result dict that run() returns
+        """
+        # Generate conversation ID if not provided. The UUID keys in-process
+        # state; the caller's own string is what goes back out and to storage
+        if conversation_id:
+            conversation_ref = str(conversation_id)
+            conversation_id = coerce_conversation_id(conversation_id)
+        else:
+            conversation_id = uuid.uuid4()
+            conversation_ref = str(conversation_id)
         
         # Initialize state
         state = AgentState(
             conversation_id=conversation_id,
+            conversation_ref=conversation_ref,
             user_id=user_id,
             user_message=user_message,
             max_iterations=self.max_iterations
         )
         
         try:
-            # Create or get database conversation
-            state.db_conversation_id = self.long_term_memory.create_conversation(user_id)
-            
             # Add user message to short-term memory
             self.short_term_memory.add_message(
                 conversation_id,
@@ -108,54 +215,91 @@ class EnhancedAgent:
                 content=user_message
             )
             
-            # Save user message to long-term memory
-            self.long_term_memory.save_message(
-                state.db_conversation_id,
-                role="user",
-                content=user_message
+            # Get conversation context
+            context = self.short_term_memory.format_for_llm(
+                conversation_id,
+                max_messages=CONTEXT_WINDOW
             )
             
-            # Get conversation context
-            context = self.short_term_memory.format_for_llm(conversation_id)
+            # Near-duplicate plans are only shared within the same conversation
+            # state, so a short reply like "yes" can't pick up another
+            # conversation's plan
+            plan_scope = self.plan_cache.make_scope(context[:-1])
             
-            # Get semantic context if enabled
-            semantic_context = None
-            if use_semantic_memory and self.semantic_memory:
-                semantic_context = await self._get_semantic_context(
-                    user_message,
-                    conversation_id
-                )
+            # Get relevant semantic context and look up a near-duplicate plan
+            # concurrently; both are embedding round-trips on the user message
+            semantic_lookup = (
+                self._get_semantic_context(user_message, conversation_ref)
+                if use_semantic_memory and self.semantic_memory
+                else _none()
+            )
+            semantic_context, similar_plan = await asyncio.gather(
+                semantic_lookup,
+                self._get_similar_plan(user_message, plan_scope)
+            )
             
             # Agent loop: Plan -> Act -> Observe
             while state.iteration < state.max_iterations:
                 state.iteration += 1
                 
-                print(f"\n🔄 Iteration {state.iteration}/{state.max_iterations}")
+                log.debug("🔄 Iteration %d/%d", state.iteration, state.max_iterations)
                 
-                # PLAN: Generate plan with retry
-                try:
-                    plan_result = await retry_with_backoff(
-                        lambda: self.planner.create_plan(
+                # PLAN: Reuse a cached plan for the first iteration if possible
+                plan_result = None
+                cache_key = None
+                if state.iteration == 1:
+                    cache_key = self.plan_cache.make_key(
+                        state.user_message,
+                        state.observations,
+                        semantic_context,
+                        context
+                    )
+                    plan_result = self.plan_cache.get(cache_key)
+                    if plan_result is None:
+                        plan_result = similar_plan
+                    if plan_result is not None:
+                        log.debug("♻️  Using cached plan")
+                
+                # PLAN: Generate plan with retry, streaming tokens; read-only
+                # tools start as soon as the streamed plan has named them
+                started: Dict[Tuple[str, str], asyncio.Task] = {}
+                if plan_result is None:
+                    scanner = ToolCallScanner()
+                    try:
+                        async for event in self._stream_plan_with_retry(
                             user_message=state.user_message,
                             context=context,
                             observations=state.observations,
-                            semantic_context=semantic_context
-                        ),
-                        max_retries=2,
-                        on_retry=lambda attempt, max_retries, e: print(
-                            f"⚠️  Planning retry {attempt}/{max_retries}: {e}"
-                        )
-                    )
-                except Exception as e:
-                    raise PlanningError(f"Planning failed: {e}") from e
+                            semantic_context=semantic_context,
+                            observations_text=state.observations_prompt
+                        ):
+                            if event["type"] == "plan":
+                                plan_result = event["data"]
+                            else:
+                                if event["type"] == "plan_token":
+                                    self.executor.speculate(
+                                        self.parser.parse(scanner.feed(event["data"])),
+                                        started
+                                    )
+                                elif event["type"] == "plan_retry":
+                                    scanner = ToolCallScanner()
+                                yield event
+                    except Exception as e:
+                        self.executor.cancel_started(started)
+                        raise PlanningError(f"Planning failed: {e}") from e
+                    
+                    if cache_key and self.plan_cache.is_cacheable(plan_result):
+                        await self._cache_plan(cache_key, plan_result, state.user_message, plan_scope)
                 
                 state.plan = plan_result.get("plan")
-                print(f"📋 Plan: {state.plan[:100]}...")
+                log.debug("📋 Plan: %.100s...", state.plan)
+                yield {"type": "plan", "data": state.plan}
                 
                 # Check if task is complete
                 if plan_result.get("is_complete", False):
+                    self.executor.cancel_started(started)
                     state.final_response = plan_result.get("response")
-                    print("✅ Task complete (no tools needed)")
+                    log.debug("✅ Task complete (no tools needed)")
                     break
                 
                 # PARSE: Extract tool calls
@@ -163,46 +307,66 @@ class EnhancedAgent:
                 
                 if not tool_calls:
                     # No tools needed, generate final response
+                    self.executor.cancel_started(started)
                     state.final_response = plan_result.get("response")
-                    print("✅ Task complete (direct response)")
+                    log.debug("✅ Task complete (direct response)")
                     break
                 
-                print(f"🔧 Tools to execute: {[tc['tool'] for tc in tool_calls]}")
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("🔧 Tools to execute: %s", ", ".join(tc["tool"] for tc in tool_calls))
                 state.tool_calls.extend(tool_calls)
                 
-                # ACT: Execute tool calls with retry
+                for tool_call in tool_calls:
+                    yield {"type": "tool_call", "data": tool_call}
+                
+                # ACT: Execute tool calls, streaming results as they complete
+                execution_results: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
                 try:
-                    execution_results = await retry_with_backoff(
-                        lambda: self.executor.execute_tools(tool_calls),
-                        max_retries=2,
-                        exceptions=(ToolExecutionError,),
-                        on_retry=lambda attempt, max_retries, e: print(
-                            f"⚠️  Tool execution retry {attempt}/{max_retries}: {e}"
-                        )
-                    )
+                    async for index, result in self.executor.execute_tools_iter(
+                        tool_calls,
+                        timeout=settings.tool_phase_timeout or None,
+                        started=started
+                    ):
+                        execution_results[index] = result
+                        yield {"type": "tool_result", "data": result}
                 except Exception as e:
                     # Tool execution failed, but continue with error info
-                    execution_results = [{
-                        "tool": tc["tool"],
-                        "success": False,
-                        "error": str(e)
-                    } for tc in tool_calls]
-                    print(f"❌ Tool execution failed: {e}")
+                    execution_results = [
+                        result or {
+                            "tool": tc["tool"],
+                            "success": False,
+                            "error": str(e)
+                        }
+                        for tc, result in zip(tool_calls, execution_results)
+                    ]
+                    log.error("❌ Tool execution failed: %s", e)
+                finally:
+                    self.executor.cancel_started(started)
                 
                 # OBSERVE: Process results
-                observation = await self.observer.observe(
+                observation: Dict[str, Any] = {}
+                async for event in self.observer.stream_observe(
                     plan=state.plan,
                     tool_calls=tool_calls,
                     execution_results=execution_results
-                )
+                ):
+                    if event["type"] == "observation":
+                        observation = event["data"]
+                    else:
+                        yield event
                 
                 state.observations.append(observation.get("observation", ""))
-                print(f"👁️  Observation: {observation.get('observation', '')[:100]}...")
+                line = format_observation(len(state.observations), state.observations[-1])
+                state.observations_prompt = (
+                    f"{state.observations_prompt}\n{line}" if state.observations_prompt else line
+                )
+                log.debug("👁️  Observation: %.100s...", state.observations[-1])
+                yield {"type": "observation", "data": state.observations[-1]}
                 
                 # Check if we should finish
                 if observation.get("should_finish", False):
                     state.final_response = observation.get("response")
-                    print("✅ Task complete (after tool execution)")
+                    log.debug("✅ Task complete (after tool execution)")
                     break
             
             # If max iterations reached without completion
@@ -211,7 +375,7 @@ class EnhancedAgent:
                     "I apologize, but I couldn't complete the task within the allowed iterations. "
                     "Please try rephrasing your request or breaking it into smaller tasks."
                 )
-                print("⚠️  Max iterations reached")
+                log.warning("⚠️  Max iterations reached")
             
             # Add assistant response to short-term memory
             self.short_term_memory.add_message(
@@ -220,41 +384,34 @@ class EnhancedAgent:
                 content=state.final_response
             )
             
-            # Save assistant response to long-term memory
-            self.long_term_memory.save_message(
-                state.db_conversation_id,
-                role="assistant",
-                content=state.final_response
-            )
-            
-            # Save task history
-            if state.tool_calls:
-                self.long_term_memory.save_task(
+            # Persist the turn in one transaction
+            try:
+                state.db_conversation_id = await self._run_in_thread(
+                    db,
+                    self.long_term_memory.persist_turn,
+                    user_id,
                     state.db_conversation_id,
-                    task_description=state.user_message,
-                    tools_used=state.tool_calls,
-                    status="completed" if state.final_response else "failed",
-                    result={"response": state.final_response}
+                    state.user_message,
+                    state.final_response,
+                    tool_calls=state.tool_calls,
+                    metadata={
+                        "conversation_id": conversation_ref,
+                        "iterations": state.iteration,
+                        "tools_used": len(state.tool_calls)
+                    },
+                    db=db
                 )
+            except Exception as e:
+                log.warning("⚠️  Failed to persist turn: %s", e)
+                await self._rollback(db)
             
-            # Add conversation to semantic memory
+            # Add conversation to semantic memory off the critical path
             if self.semantic_memory:
-                await self._save_to_semantic_memory(state, context)
+                self._enqueue_semantic_write(state, context)
             
-            # Log interaction
-            self.long_term_memory.log_interaction(
-                user_id=user_id,
-                interaction_type="chat",
-                metadata={
-                    "conversation_id": conversation_id,
-                    "iterations": state.iteration,
-                    "tools_used": len(state.tool_calls)
-                }
-            )
-            
-            return {
+            final = {
                 "response": state.final_response,
-                "conversation_id": conversation_id,
+                "conversation_id": conversation_ref,
                 "iterations": state.iteration,
                 "plan": state.plan,
                 "tool_calls": state.tool_calls,
@@ -263,7 +420,7 @@ class EnhancedAgent:
             }
             
         except Exception as e:
-            print(f"❌ Agent error: {e}")
+            log.exception("❌ Agent error: %s", e)
             # Save error to memory
             error_response = f"I encountered an error: {str(e)}"
             
@@ -273,38 +430,150 @@ class EnhancedAgent:
                 content=error_response
             )
             
-            if state.db_conversation_id:
-                self.long_term_memory.save_message(
+            try:
+                state.db_conversation_id = await self._run_in_thread(
+                    db,
+                    self.long_term_memory.persist_turn,
+                    user_id,
                     state.db_conversation_id,
-                    role="assistant",
-                    content=error_response,
-                    metadata={"error": str(e)}
+                    state.user_message,
+                    error_response,
+                    metadata={"conversation_id": conversation_ref, "error": str(e)},
+                    assistant_metadata={"error": str(e)},
+                    db=db
                 )
+            except Exception as persist_error:
+                log.warning("⚠️  Failed to persist turn: %s", persist_error)
+                await self._rollback(db)
             
-            return {
+            final = {
                 "response": error_response,
-                "conversation_id": conversation_id,
+                "conversation_id": conversation_ref,
                 "iterations": state.iteration,
                 "error": str(e)
             }
+        
+        yield {"type": "final", "data": final}
+    
+    async def close(self):
+        """Stop the semantic memory writer and release semantic memory"""
+        if self._semantic_worker is not None:
+            self._semantic_worker.cancel()
+            try:
+                await self._semantic_worker
+            except asyncio.CancelledError:
+                pass
+            self._semantic_worker = None
+        if self.semantic_memory:
+            await self.semantic_memory.close()
+    
+    @staticmethod
+    async def _run_in_thread(db: Optional[Session], fn, /, *args, **kwargs):
+        """
+        Run a blocking database call in a worker thread
+        
+        With a caller session, cancellation (e.g. the request timeout) waits
+        for the thread before propagating, so the caller never rolls back or
+        closes the session while the thread is still using it.
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+        if db is None:
+            return await task
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            await asyncio.wait({task})
+            if not task.cancelled():
+                task.exception()  # Retrieved here; the cancellation wins
+            raise
+    
+    @classmethod
+    async def _rollback(cls, db: Optional[Session]) -> None:
+        """Discard a failed write on the caller's session so the request can still commit"""
+        if db is not None:
+            await cls._run_in_thread(db, db.rollback)
     
     async def _get_semantic_context(
         self,
         query: str,
-        conversation_id: str
+        conversation_ref: str
     ) -> Optional[str]:
         """Get relevant context from semantic memory"""
         try:
             context = await self.semantic_memory.retrieve_context(
                 query=query,
                 limit=3,
-                filter_metadata={"conversation_id": conversation_id}
+                filter_metadata={"conversation_id": conversation_ref}
             )
-            return context if context != "No relevant context found." else None
+            return context.text if context.has_context else None
         except Exception as e:
-            print(f"⚠️  Semantic memory retrieval failed: {e}")
+            log.warning("⚠️  Semantic memory retrieval failed: %s", e)
             return None
     
+    async def _stream_plan_with_retry(self, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a plan, retrying with exponential backoff"""
+        delay = RETRY_INITIAL_DELAY
+        
+        for attempt in range(1, MAX_RETRIES + 2):
+            try:
+                async for event in self.planner.stream_plan(**kwargs):
+                    yield event
+                return
+            except Exception as e:
+                if attempt > MAX_RETRIES:
+                    raise MaxRetriesExceeded(
+                        f"Failed after {MAX_RETRIES} retries: {e}"
+                    ) from e
+                _log_retry("Planning", attempt, MAX_RETRIES, e)
+            
+            # Back off outside the except block so the failed attempt's
+            # traceback is not kept alive while waiting
+            yield {"type": "plan_retry", "data": attempt}
+            await asyncio.sleep(delay * (0.5 + random.random()))
+            delay *= RETRY_BACKOFF_FACTOR
+    
+    async def _get_similar_plan(self, user_message: str, scope: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached plan for a near-duplicate request in the same conversation state"""
+        try:
+            return await self.plan_cache.get_similar(user_message, scope)
+        except Exception as e:
+            log.warning("⚠️  Plan cache lookup failed: %s", e)
+            return None
+    
+    async def _cache_plan(
+        self,
+        cache_key: str,
+        plan_result: Dict[str, Any],
+        user_message: str,
+        scope: str
+    ) -> None:
+        """Store a freshly generated plan in the plan cache"""
+        try:
+            await self.plan_cache.put(cache_key, plan_result, text=user_message, scope=scope)
+        except Exception as e:
+            log.warning("⚠️  Failed to cache plan: %s", e)
+    
+    def _enqueue_semantic_write(
+        self,
+        state: AgentState,
+        context: List[Dict[str, str]]
+    ) -> None:
+        """Queue a semantic memory write, starting the background worker if needed"""
+        if self._semantic_queue is None:
+            self._semantic_queue = asyncio.Queue()
+        if self._semantic_worker is None or self._semantic_worker.done():
+            self._semantic_worker = asyncio.create_task(self._semantic_write_worker())
+        self._semantic_queue.put_nowait((state, context))
+    
+    async def _semantic_write_worker(self) -> None:
+        """Drain queued semantic memory writes in the background"""
+        while True:
+            state, context = await self._semantic_queue.get()
+            try:
+                await self._save_to_semantic_memory(state, context)
+            finally:
+                self._semantic_queue.task_done()
+    
     async def _save_to_semantic_memory(
         self,
         state: AgentState,
@@ -313,14 +582,14 @@ class EnhancedAgent:
         """Save conversation to semantic memory"""
         try:
             await self.semantic_memory.add_conversation_to_memory(
-                conversation_id=state.conversation_id,
+                conversation_id=state.conversation_ref,
                 messages=context,
                 user_id=state.user_id
             )
         except Exception as e:
-            print(f"⚠️  Failed to save to semantic memory: {e}")
+            log.warning("⚠️  Failed to save to semantic memory: %s", e)
     
-    def _get_memory_stats(self, conversation_id: str) -> Dict[str, Any]:
+    def _get_memory_stats(self, conversation_id: uuid.UUID) -> Dict[str, Any]:
         """Get memory statistics"""
         stats = {
             "short_term": self.short_term_memory.get_conversation_summary(conversation_id),
@@ -333,6 +602,6 @@ class EnhancedAgent:
         
         return stats
     
-    def clear_conversation(self, conversation_id: str) -> None:
+    def clear_conversation(self, conversation_id: Union[str, uuid.UUID]) -> None:
         """Clear conversation from short-term memory"""
-        self.short_term_memory.clear_context(conversation_id)
+        self.short_term_memory.clear_context(coerce_conversation_id(conversation_id))
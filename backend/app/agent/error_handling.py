@@ -3,10 +3,13 @@ Error handling utilities for agent operations
 """
 from typing import Callable, Any, Optional, Type
 from functools import wraps
-import asyncio
+import logging
 import time
 
 
+log = logging.getLogger(__name__)
+
+
 class AgentError(Exception):
     """Base exception for agent errors"""
     pass
@@ -32,55 +35,9 @@ class MaxRetriesExceeded(AgentError):
     pass
 
 
-async def retry_with_backoff(
-    func: Callable,
-    max_retries: int = 3,
-    initial_delay: float = 1.0,
-    backoff_factor: float = 2.0,
-    exceptions: tuple = (Exception,),
-    on_retry: Optional[Callable] = None
-) -> Any:
-    """
-    Retry a function with exponential backoff
-    
-    Args:
-        func: Async function to retry
-        max_retries: Maximum number of retry attempts
-        initial_delay: Initial delay in seconds
-        backoff_factor: Multiplier for delay on each retry
-        exceptions: Tuple of exceptions to catch
-        on_retry: Optional callback function called on each retry
-        
-    Returns:
-        Function result
-        
-    Raises:
-        MaxRetriesExceeded: If all retries are exhausted
-    """
-    delay = initial_delay
-    last_exception = None
-    
-    for attempt in range(max_retries + 1):
-        try:
-            return await func()
-        except exceptions as e:
-            last_exception = e
-            
-            if attempt == max_retries:
-                raise MaxRetriesExceeded(
-                    f"Failed after {max_retries} retries: {str(e)}"
-                ) from e
-            
-            # Call retry callback if provided
-            if on_retry:
-                on_retry(attempt + 1, max_retries, e)
-            
-            # Wait before retrying
-            await asyncio.sleep(delay)
-            delay *= backoff_factor
-    
-    # Should never reach here, but just in case
-    raise last_exception
+class CircuitOpenError(AgentError):
+    """Call rejected because the circuit breaker is open"""
+    pass
 
 
 def handle_agent_errors(error_handler: Optional[Callable] = None):
@@ -100,11 +57,11 @@ def handle_agent_errors(error_handler: Optional[Callable] = None):
                 if error_handler:
                     return error_handler(e)
                 else:
-                    print(f"Agent error in {func.__name__}: {e}")
+                    log.error("Agent error in %s: %s", func.__name__, e)
                     raise
             except Exception as e:
                 # Unexpected errors
-                print(f"Unexpected error in {func.__name__}: {e}")
+                log.exception("Unexpected error in %s: %s", func.__name__, e)
                 if error_handler:
                     return error_handler(e)
                 raise
@@ -115,29 +72,42 @@ def handle_agent_errors(error_handler: Optional[Callable] = None):
 class CircuitBreaker:
     """
     Circuit breaker pattern for preventing cascading failures
+    
+    Callers either wrap a call with call(), or bracket it themselves with
+    acquire() and exactly one of record_success(), record_failure() or
+    release() when the outcome is judged from the result.
     """
     
     def __init__(
         self,
         failure_threshold: int = 5,
         recovery_timeout: float = 60.0,
-        expected_exception: Type[Exception] = Exception
+        expected_exception: Type[Exception] = Exception,
+        name: Optional[str] = None,
+        is_failure: Optional[Callable[[Exception], bool]] = None
     ):
         """
         Initialize circuit breaker
         
         Args:
-            failure_threshold: Number of failures before opening circuit
+            failure_threshold: Number of consecutive failures before opening circuit
             recovery_timeout: Seconds to wait before attempting recovery
             expected_exception: Exception type to catch
+            name: Optional name used in error messages
+            is_failure: Optional predicate for caught exceptions; those it
+                rejects mean the callee answered and count as a success
         """
+        self.name = name
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
         self.expected_exception = expected_exception
+        self.is_failure = is_failure
         
         self.failure_count = 0
         self.last_failure_time = None
         self.state = "closed"  # closed, open, half-open
+        # Set while the single half-open probe is in flight
+        self._probing = False
     
     async def call(self, func: Callable, *args, **kwargs) -> Any:
         """
@@ -151,36 +121,83 @@ class CircuitBreaker:
             Function result
             
         Raises:
-            Exception: If circuit is open or function fails
+            CircuitOpenError: If circuit is open
+            Exception: If function fails
         """
-        if self.state == "open":
-            # Check if we should attempt recovery
-            if time.time() - self.last_failure_time >= self.recovery_timeout:
-                self.state = "half-open"
-            else:
-                raise Exception("Circuit breaker is OPEN")
+        self.acquire()
         
         try:
             result = await func(*args, **kwargs)
-            
-            # Success - reset if we were in half-open state
-            if self.state == "half-open":
-                self.state = "closed"
-                self.failure_count = 0
-            
-            return result
-            
         except self.expected_exception as e:
-            self.failure_count += 1
-            self.last_failure_time = time.time()
-            
-            if self.failure_count >= self.failure_threshold:
-                self.state = "open"
-            
-            raise e
+            if self.is_failure is None or self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            # Cancelled or unexpected: no verdict on the server
+            self.release()
+            raise
+        
+        self.record_success()
+        return result
+    
+    def acquire(self) -> None:
+        """
+        Admit a call, or reject it while the circuit is open
+        
+        Once the recovery timeout has passed, a single probe call is
+        admitted in the half-open state; others are rejected until it
+        finishes.
+        
+        Raises:
+            CircuitOpenError: If the call is not admitted
+        """
+        # Closed is the common case; only consult the clock otherwise
+        if self.state == "closed":
+            return
+        
+        if self.state == "open":
+            # Check if we should attempt recovery
+            if time.monotonic() - self.last_failure_time < self.recovery_timeout:
+                raise self._open_error()
+            self.state = "half-open"
+        elif self._probing:
+            raise self._open_error()
+        
+        self._probing = True
+    
+    def record_success(self) -> None:
+        """Close the circuit and reset the failure streak"""
+        self._probing = False
+        if self.failure_count or self.state != "closed":
+            self.state = "closed"
+            self.failure_count = 0
+    
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold"""
+        self.failure_count += 1
+        self.last_failure_time = time.monotonic()
+        
+        # A failed recovery attempt reopens the circuit immediately
+        if self.state == "half-open" or self.failure_count >= self.failure_threshold:
+            self.state = "open"
+        self._probing = False
+    
+    def release(self) -> None:
+        """End an admitted call that says nothing about the server's health"""
+        self._probing = False
     
     def reset(self):
         """Reset circuit breaker to closed state"""
         self.failure_count = 0
         self.last_failure_time = None
         self.state = "closed"
+        self._probing = False
+    
+    def _open_error(self) -> CircuitOpenError:
+        """Rejection raised while the circuit is open or probing"""
+        return CircuitOpenError(
+            f"Circuit breaker is OPEN for {self.name}" if self.name
+            else "Circuit breaker is OPEN"
+        )
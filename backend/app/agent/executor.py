@@ -1,10 +1,112 @@
 """
 Tool Executor - Executes validated tool calls
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Mapping, Sequence, Set, Tuple, Final, AsyncIterator, Optional
+from types import MappingProxyType
+from collections import defaultdict
 import asyncio
+import logging
+
+import aiohttp
 
 from app.mcp.client import MCPClient
+from app.config import settings
+from app.agent.error_handling import ToolExecutionError, CircuitBreaker
+from app.utils.json_utils import dumps
+
+
+log = logging.getLogger(__name__)
+
+
+# Map tools to MCP servers
+_TOOL_TO_SERVER: Final[Mapping[str, str]] = MappingProxyType({
+    # Memory DB tools
+    "save_conversation": "memory_db",
+    "get_user_preferences": "memory_db",
+    "log_interaction": "memory_db",
+    "get_task_history": "memory_db",
+    "get_user_context": "memory_db",
+
+    # Vector DB tools
+    "store_embedding": "vector_db",
+    "semantic_search": "vector_db",
+    "retrieve_context": "vector_db",
+
+    # Telegram tools
+    "send_telegram_message": "telegram",
+    "get_telegram_updates": "telegram",
+    "send_telegram_notification": "telegram",
+    "send_telegram_batch": "telegram",
+
+    # Calendar tools
+    "list_calendar_events": "calendar",
+    "create_calendar_event": "calendar",
+    "update_calendar_event": "calendar",
+    "delete_calendar_event": "calendar",
+
+    # Gmail tools
+    "list_emails": "gmail",
+    "read_email": "gmail",
+    "create_email_draft": "gmail",
+    "send_email": "gmail",
+
+    # Windows OS tools
+    "open_application": "windows_os",
+    "close_application": "windows_os",
+    "run_powershell": "windows_os",
+    "manage_files": "windows_os",
+
+    # Voice tools
+    "transcribe_audio": "voice",
+    "synthesize_speech": "voice",
+})
+
+# Tools without side effects, safe to start before the plan is final
+READ_ONLY_TOOLS: Final[frozenset] = frozenset({
+    "get_user_preferences",
+    "get_task_history",
+    "get_user_context",
+    "semantic_search",
+    "retrieve_context",
+    "list_calendar_events",
+    "list_emails",
+    "read_email",
+})
+
+# Reverse index of tools served by each MCP server
+_SERVER_TO_TOOLS: Final[Mapping[str, Tuple[str, ...]]] = MappingProxyType({
+    server: tuple(tool for tool, srv in _TOOL_TO_SERVER.items() if srv == server)
+    for server in dict.fromkeys(_TOOL_TO_SERVER.values())
+})
+
+
+def _is_server_failure(error: Exception) -> bool:
+    """
+    Whether an error means the MCP server itself is unhealthy
+    
+    Transport errors, timeouts and 5xx responses count; a tool that the
+    server ran and reported as failed (bad parameters, unknown chat, ...)
+    does not, since the server answered.
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, TimeoutError))
+
+
+def _record_error(breaker: CircuitBreaker, error: Exception) -> None:
+    """Judge a request that raised"""
+    if _is_server_failure(error):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def _record_outcome(breaker: CircuitBreaker, results: Sequence[Any]) -> None:
+    """Count a multi-call request as a failure only if a call in it hit a server failure"""
+    if any(isinstance(result, Exception) and _is_server_failure(result) for result in results):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
 
 
 class ToolExecutor:
@@ -12,111 +114,323 @@ class ToolExecutor:
     Executes tool calls via MCP client
     """
     
-    def __init__(self):
-        self.mcp_client = MCPClient()
-        
-        # Map tools to MCP servers
-        self.tool_to_server = {
-            # Memory DB tools
-            "save_conversation": "memory_db",
-            "get_user_preferences": "memory_db",
-            "log_interaction": "memory_db",
-            "get_task_history": "memory_db",
-            
-            # Vector DB tools
-            "store_embedding": "vector_db",
-            "semantic_search": "vector_db",
-            "retrieve_context": "vector_db",
-            
-            # Telegram tools
-            "send_telegram_message": "telegram",
-            "get_telegram_updates": "telegram",
-            "send_telegram_notification": "telegram",
-            
-            # Calendar tools
-            "list_calendar_events": "calendar",
-            "create_calendar_event": "calendar",
-            "update_calendar_event": "calendar",
-            "delete_calendar_event": "calendar",
-            
-            # Gmail tools
-            "list_emails": "gmail",
-            "read_email": "gmail",
-            "create_email_draft": "gmail",
-            "send_email": "gmail",
-            
-            # Windows OS tools
-            "open_application": "windows_os",
-            "close_application": "windows_os",
-            "run_powershell": "windows_os",
-            "manage_files": "windows_os",
-            
-            # Voice tools
-            "transcribe_audio": "voice",
-            "synthesize_speech": "voice",
+    def __init__(self, mcp_client: Optional[MCPClient] = None):
+        self.mcp_client = mcp_client or MCPClient()
+        
+        # Cap in-flight tool calls overall; the MCP client caps each server
+        self._sem = asyncio.Semaphore(settings.tool_concurrency)
+        
+        # Fail fast on MCP servers that keep erroring instead of waiting
+        # for each call to time out
+        self._breakers: Dict[str, CircuitBreaker] = {
+            server: CircuitBreaker(
+                failure_threshold=3,
+                recovery_timeout=30.0,
+                name=server,
+                is_failure=_is_server_failure
+            )
+            for server in _SERVER_TO_TOOLS
         }
+        
+        # Servers without an /execute_batch endpoint
+        self._batch_unsupported: Set[str] = set()
+        
+        # Shared, immutable tool routing table
+        self.tool_to_server = _TOOL_TO_SERVER
     
     async def execute_tools(
         self,
-        tool_calls: List[Dict[str, Any]]
+        tool_calls: Sequence[Mapping[str, Any]],
+        timeout: Optional[float] = None
     ) -> List[Dict[str, Any]]:
         """
         Execute multiple tool calls
         
         Args:
             tool_calls: List of validated tool calls
+            timeout: Optional deadline in seconds for the whole batch
             
         Returns:
-            List of execution results
+            List of execution results, in the same order as tool_calls
         """
-        tasks = [
-            self._execute_single_tool(call)
-            for call in tool_calls
-        ]
+        results: List[Dict[str, Any]] = [None] * len(tool_calls)
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        async for index, result in self.execute_tools_iter(tool_calls, timeout=timeout):
+            results[index] = result
         
-        return [
-            {
-                "tool": tool_calls[i]["tool"],
-                "success": not isinstance(result, Exception),
-                "result": str(result) if isinstance(result, Exception) else result,
-                "error": str(result) if isinstance(result, Exception) else None
-            }
-            for i, result in enumerate(results)
-        ]
+        return results
+    
+    def speculate(
+        self,
+        tool_calls: Sequence[Mapping[str, Any]],
+        started: Dict[Tuple[str, str], asyncio.Task]
+    ) -> None:
+        """
+        Start read-only tool calls before the plan that requests them is final
+        
+        Calls that are not in READ_ONLY_TOOLS, or were already started, are
+        ignored. Pass the same started dict to execute_tools_iter so the
+        final plan reuses these calls, and cancel whatever it did not use.
+        
+        Args:
+            tool_calls: Validated tool calls parsed from a partial plan
+            started: In-flight calls by (tool, parameters) key, updated in place
+        """
+        for call in tool_calls:
+            if call["tool"] not in READ_ONLY_TOOLS:
+                continue
+            key = self._call_key(call)
+            if key is None or key in started:
+                continue
+            server_name = _TOOL_TO_SERVER.get(call["tool"])
+            if server_name is None:
+                continue
+            started[key] = asyncio.create_task(self._execute_server_batch(server_name, [call]))
+    
+    @staticmethod
+    def cancel_started(started: Dict[Tuple[str, str], asyncio.Task]) -> None:
+        """Cancel speculative calls that the final plan did not use"""
+        for task in started.values():
+            task.cancel()
+        started.clear()
     
-    async def _execute_single_tool(
+    async def execute_tools_iter(
         self,
-        tool_call: Dict[str, Any]
-    ) -> Any:
+        tool_calls: Sequence[Mapping[str, Any]],
+        timeout: Optional[float] = None,
+        started: Optional[Mapping[Tuple[str, str], asyncio.Task]] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
         """
-        Execute a single tool call
+        Execute multiple tool calls, yielding results as they complete
+        
+        Calls are grouped by MCP server and each group is sent as one
+        batch request, so the number of RPCs is bounded by the number
+        of servers involved rather than the number of calls.
+        
+        Identical read-only calls (same tool and parameters) are only
+        executed once and the result is fanned out to every duplicate;
+        calls with side effects always run as many times as requested.
+        
+        Once the deadline passes, calls still in flight are cancelled and
+        reported as failed so the caller can observe the partial results
+        instead of blocking on the slowest tool.
+        
+        Calls already started by speculate() are awaited instead of sent
+        again.
         
         Args:
-            tool_call: Validated tool call
+            tool_calls: List of validated tool calls
+            timeout: Optional deadline in seconds for the whole batch
+            started: Optional in-flight calls from speculate()
             
-        Returns:
-            Tool execution result
+        Yields:
+            (index into tool_calls, execution result) tuples
         """
-        tool_name = tool_call["tool"]
-        parameters = tool_call["parameters"]
+        # Coalesce identical read-only calls onto the first occurrence
+        first_by_key: Dict[Tuple[str, str], int] = {}
+        duplicates: Dict[int, List[int]] = defaultdict(list)
+        unique: List[int] = []
+        for i, call in enumerate(tool_calls):
+            key = self._call_key(call) if call["tool"] in READ_ONLY_TOOLS else None
+            first = first_by_key.setdefault(key, i) if key is not None else i
+            if first == i:
+                unique.append(i)
+            else:
+                duplicates[first].append(i)
         
-        # Get MCP server for this tool
-        server_name = self.tool_to_server.get(tool_name)
+        # Group unique call indices by MCP server
+        by_server: Dict[str, List[int]] = defaultdict(list)
+        speculative: Dict[int, asyncio.Task] = {}
+        for i in unique:
+            call = tool_calls[i]
+            server_name = _TOOL_TO_SERVER.get(call["tool"])
+            task = started.get(self._call_key(call)) if started else None
+            if task is not None:
+                speculative[i] = task
+            elif server_name is None:
+                result = self._format_result(
+                    call,
+                    ValueError(f"No MCP server found for tool: {call['tool']}")
+                )
+                yield i, result
+                for j in duplicates.get(i, ()):
+                    yield j, dict(result)
+            else:
+                by_server[server_name].append(i)
         
-        if not server_name:
-            raise ValueError(f"No MCP server found for tool: {tool_name}")
+        tasks = [
+            asyncio.ensure_future(self._execute_group(server, indices, tool_calls))
+            for server, indices in by_server.items()
+        ]
+        tasks.extend(
+            asyncio.ensure_future(self._await_started(i, task))
+            for i, task in speculative.items()
+        )
+        
+        pending = {i for indices in by_server.values() for i in indices}
+        pending.update(speculative)
         
         try:
-            # Execute via MCP client
-            result = await self.mcp_client.call_tool(
-                server=server_name,
-                tool=tool_name,
-                parameters=parameters
-            )
-            return result
+            for next_done in asyncio.as_completed(tasks, timeout=timeout):
+                try:
+                    indices, batch = await next_done
+                except asyncio.TimeoutError:
+                    log.warning("⚠️  Tool execution timed out after %ss", timeout)
+                    break
+                for position, i in enumerate(indices):
+                    pending.discard(i)
+                    raw = batch if isinstance(batch, Exception) else batch[position]
+                    result = self._format_result(tool_calls[i], raw)
+                    yield i, result
+                    for j in duplicates.get(i, ()):
+                        yield j, dict(result)
             
+            # Report calls abandoned at the deadline
+            for i in sorted(pending):
+                result = self._format_result(
+                    tool_calls[i],
+                    ToolExecutionError(f"Tool {tool_calls[i]['tool']} timed out after {timeout}s")
+                )
+                yield i, result
+                for j in duplicates.get(i, ()):
+                    yield j, dict(result)
+        finally:
+            # Cancel outstanding calls if the consumer stops early
+            for task in tasks:
+                task.cancel()
+    
+    async def _execute_group(
+        self,
+        server_name: str,
+        indices: List[int],
+        tool_calls: Sequence[Mapping[str, Any]]
+    ) -> Tuple[List[int], Any]:
+        """Execute one server group, returning its indices with results or the batch error"""
+        try:
+            batch = await self._execute_server_batch(
+                server_name,
+                [tool_calls[i] for i in indices]
+            )
         except Exception as e:
-            print(f"Error executing tool {tool_name}: {e}")
+            batch = e
+        return indices, batch
+    
+    @staticmethod
+    async def _await_started(index: int, task: asyncio.Task) -> Tuple[List[int], Any]:
+        """Wait for a speculatively started call, in the shape of _execute_group"""
+        try:
+            batch = await task
+        except Exception as e:
+            batch = e
+        return [index], batch
+    
+    @staticmethod
+    def _call_key(tool_call: Mapping[str, Any]) -> Optional[Tuple[str, str]]:
+        """Identity of a tool call for deduplication, or None if it can't be keyed"""
+        try:
+            return tool_call["tool"], dumps(tool_call.get("parameters", {}), sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+    
+    @staticmethod
+    def _format_result(tool_call: Mapping[str, Any], result: Any) -> Dict[str, Any]:
+        """Format a raw tool result or exception as an execution result"""
+        failed = isinstance(result, Exception)
+        return {
+            "tool": tool_call["tool"],
+            "success": not failed,
+            "result": str(result) if failed else result,
+            "error": str(result) if failed else None
+        }
+    
+    async def _execute_server_batch(
+        self,
+        server_name: str,
+        tool_calls: Sequence[Mapping[str, Any]]
+    ) -> List[Any]:
+        """
+        Execute tool calls that target the same MCP server
+        
+        Args:
+            server_name: MCP server name
+            tool_calls: Validated tool calls for this server
+            
+        Returns:
+            Per-call results, with failures as exception instances
+        """
+        async with self._sem:
+            if len(tool_calls) == 1:
+                tool_name = tool_calls[0]["tool"]
+                try:
+                    # Execute via MCP client
+                    result = await self._breakers[server_name].call(
+                        self.mcp_client.call_tool,
+                        server=server_name,
+                        tool=tool_name,
+                        parameters=tool_calls[0]["parameters"]
+                    )
+                    return [result]
+                except Exception as e:
+                    log.warning("Error executing tool %s: %s", tool_name, e)
+                    return [e]
+            
+            if server_name in self._batch_unsupported:
+                return await self._call_concurrently(server_name, tool_calls)
+            
+            # Bracketed by hand: a missing batch endpoint says nothing about
+            # the server's health
+            breaker = self._breakers[server_name]
+            breaker.acquire()
+            try:
+                responses = await self.mcp_client.call_tools_batch(
+                    server=server_name,
+                    calls=[
+                        {"tool": call["tool"], "parameters": call["parameters"]}
+                        for call in tool_calls
+                    ]
+                )
+            except aiohttp.ClientResponseError as e:
+                if e.status not in (404, 405):
+                    _record_error(breaker, e)
+                    log.warning("Error executing tool batch on %s: %s", server_name, e)
+                    raise
+                breaker.release()
+                log.info("%s has no batch endpoint; sending calls concurrently", server_name)
+                self._batch_unsupported.add(server_name)
+                return await self._call_concurrently(server_name, tool_calls)
+            except Exception as e:
+                _record_error(breaker, e)
+                log.warning("Error executing tool batch on %s: %s", server_name, e)
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+        
+        results = [
+            response.get("result") if response.get("success")
+            else ToolExecutionError(response.get("error") or f"Tool {call['tool']} failed")
+            for call, response in zip(tool_calls, responses)
+        ]
+        # The server answered; failed calls are tool errors, not outages
+        breaker.record_success()
+        return results
+    
+    async def _call_concurrently(
+        self,
+        server_name: str,
+        tool_calls: Sequence[Mapping[str, Any]]
+    ) -> List[Any]:
+        """Send same-server calls as concurrent single requests"""
+        breaker = self._breakers[server_name]
+        breaker.acquire()
+        try:
+            results = await self.mcp_client.call_tools_concurrent(
+                [(server_name, call["tool"], call["parameters"]) for call in tool_calls]
+            )
+        except BaseException:
+            # Failed calls come back as results; only cancellation lands here
+            breaker.release()
             raise
+        
+        _record_outcome(breaker, results)
+        return results
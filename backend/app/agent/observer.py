@@ -1,11 +1,20 @@
 """
 Observer - Processes tool execution results
 """
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Mapping, Sequence, AsyncIterator
+import asyncio
+import logging
 
 from app.llm.ollama_client import OllamaClient
-from app.llm.prompts import OBSERVER_SYSTEM_PROMPT, OBSERVER_USER_TEMPLATE
+from app.llm.prompts import OBSERVER_SYSTEM_PROMPT, render_observer_user
+from app.utils.async_utils import iter_with_deadline
+from app.utils.json_utils import extract_json
+
+
+log = logging.getLogger(__name__)
+
+# Status line per tool result, indexed by result["success"]
+_STATUS_LABELS = ("ERR", "OK")
 
 
 class Observer:
@@ -19,7 +28,7 @@ class Observer:
     async def observe(
         self,
         plan: str,
-        tool_calls: List[Dict[str, Any]],
+        tool_calls: Sequence[Mapping[str, Any]],
         execution_results: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """
@@ -33,52 +42,100 @@ class Observer:
         Returns:
             Dict containing observation and next action decision
         """
-        # Format results for LLM
-        results_str = self._format_results(tool_calls, execution_results)
+        # Get observation from LLM; the deadline also covers time queued in the client
+        try:
+            async with asyncio.timeout(self.llm.timeout):
+                response = await self.llm.generate(
+                    prompt=self._build_user_prompt(plan, tool_calls, execution_results),
+                    system_prompt=OBSERVER_SYSTEM_PROMPT,
+                    temperature=0.5
+                )
+        except TimeoutError:
+            log.warning("Observer LLM call timed out after %ss", self.llm.timeout)
+            return self._error_observation()
+        
+        return self._to_observation(response)
+    
+    async def stream_observe(
+        self,
+        plan: str,
+        tool_calls: Sequence[Mapping[str, Any]],
+        execution_results: List[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process tool execution results, streaming LLM tokens as they arrive
         
-        # Build prompt
-        user_prompt = OBSERVER_USER_TEMPLATE.format(
-            plan=plan,
-            results=results_str
-        )
+        Args:
+            Same as observe
+            
+        Yields:
+            {"type": "observation_token", "data": str} events while generating,
+            then one {"type": "observation", "data": dict} event with the parsed observation
+            (the fallback observation if generation exceeds the client timeout)
+        """
+        # The deadline covers the whole generation, including time queued in the client
+        chunks = []
+        try:
+            async for delta in iter_with_deadline(
+                self.llm.stream_generate(
+                    prompt=self._build_user_prompt(plan, tool_calls, execution_results),
+                    system_prompt=OBSERVER_SYSTEM_PROMPT,
+                    temperature=0.5
+                ),
+                self.llm.timeout
+            ):
+                chunks.append(delta)
+                yield {"type": "observation_token", "data": delta}
+        except TimeoutError:
+            log.warning("Observer LLM stream timed out after %ss", self.llm.timeout)
+            yield {"type": "observation", "data": self._error_observation()}
+            return
         
-        # Get observation from LLM
-        response = await self.llm.generate(
-            prompt=user_prompt,
-            system_prompt=OBSERVER_SYSTEM_PROMPT,
-            temperature=0.5
-        )
+        # JSON is parsed once on the accumulated buffer
+        yield {"type": "observation", "data": self._to_observation("".join(chunks))}
+    
+    def _build_user_prompt(
+        self,
+        plan: str,
+        tool_calls: Sequence[Mapping[str, Any]],
+        execution_results: List[Dict[str, Any]]
+    ) -> str:
+        """Build the observer user prompt"""
+        # Format results for LLM
+        results_str = self._format_results(tool_calls, execution_results)
         
-        # Parse observation
+        return render_observer_user(str(plan), results_str)
+    
+    def _to_observation(self, response: str) -> Dict[str, Any]:
+        """Parse a raw LLM response, falling back to an error observation"""
         try:
             observation_data = self._parse_observation(response)
             return observation_data
         except Exception as e:
-            print(f"Error parsing observation: {e}")
-            return {
-                "observation": "Unable to process results",
-                "should_finish": True,
-                "response": "I encountered an error processing the results."
-            }
+            log.warning("Error parsing observation: %s", e)
+            return self._error_observation()
+    
+    def _error_observation(self) -> Dict[str, Any]:
+        """Fallback observation when the results could not be processed"""
+        return {
+            "observation": "Unable to process results",
+            "should_finish": True,
+            "response": "I encountered an error processing the results."
+        }
     
     def _format_results(
         self,
-        tool_calls: List[Dict[str, Any]],
+        tool_calls: Sequence[Mapping[str, Any]],
         execution_results: List[Dict[str, Any]]
     ) -> str:
         """Format tool execution results for LLM"""
-        formatted = []
-        
-        for i, (call, result) in enumerate(zip(tool_calls, execution_results)):
-            status = "✓ Success" if result["success"] else "✗ Failed"
-            formatted.append(
-                f"{i+1}. Tool: {call['tool']}\n"
-                f"   Status: {status}\n"
-                f"   Result: {result.get('result', 'No result')}\n"
-                f"   Error: {result.get('error', 'None')}"
-            )
-        
-        return "\n\n".join(formatted)
+        return "\n\n".join([
+            f"{i}. Tool: {call['tool']}\n"
+            f"   Status: {_STATUS_LABELS[bool(result['success'])]}\n"
+            f"   Result: {result.get('result', 'No result')}\n"
+            f"   Error: {result.get('error', 'None')}"
+            for i, (call, result) in enumerate(zip(tool_calls, execution_results), 1)
+        ])
     
     def _parse_observation(self, response: str) -> Dict[str, Any]:
         """
@@ -93,19 +150,7 @@ class Observer:
         }
         """
         try:
-            # Extract JSON
-            if "```json" in response:
-                json_start = response.find("```json") + 7
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "{" in response and "}" in response:
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-            else:
-                raise ValueError("No JSON found in response")
-            
-            observation_data = json.loads(json_str)
+            observation_data = extract_json(response)
             
             # Validate fields
             if "observation" not in observation_data:
@@ -116,7 +161,7 @@ class Observer:
             return observation_data
             
         except Exception as e:
-            print(f"JSON parsing error: {e}")
+            log.debug("JSON parsing error: %s", e)
             return {
                 "observation": response,
                 "should_finish": True,
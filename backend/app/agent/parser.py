@@ -1,8 +1,68 @@
 """
 Tool Call Parser - Validates and parses tool calls
 """
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Mapping, Tuple, Final
+from types import MappingProxyType
+import logging
+import re
+
+from app.utils.json_utils import loads
+
+
+log = logging.getLogger(__name__)
+
+# Start of the tool call array in a plan
+_TOOL_CALLS_ARRAY = re.compile(r'"tool_calls"\s*:\s*\[')
+
+# Characters kept from the end of the buffer while looking for the array,
+# in case its opening is split across deltas
+_ARRAY_LOOKBEHIND = 64
+
+
+# Tool name -> parameter names, shared by every parser instance
+AVAILABLE_TOOLS: Final[Mapping[str, Tuple[str, ...]]] = MappingProxyType({
+    # Memory tools
+    "save_conversation": ("conversation_id", "messages"),
+    "get_user_preferences": ("user_id",),
+    "log_interaction": ("user_id", "interaction_type", "metadata"),
+    "get_task_history": ("user_id", "limit"),
+    "get_user_context": ("user_id", "conversation_id", "limit"),
+
+    # Vector DB tools
+    "store_embedding": ("text", "metadata"),
+    "semantic_search": ("query", "limit"),
+    "retrieve_context": ("query", "limit"),
+
+    # Telegram tools
+    "send_telegram_message": ("message", "chat_id"),
+    "get_telegram_updates": (),
+    "send_telegram_notification": ("message",),
+    "send_telegram_batch": ("messages", "chat_id", "chat_ids"),
+
+    # Calendar tools
+    "list_calendar_events": ("start_date", "end_date"),
+    "create_calendar_event": ("title", "start_time", "end_time", "description"),
+    "update_calendar_event": ("event_id", "updates"),
+    "delete_calendar_event": ("event_id",),
+
+    # Gmail tools
+    "list_emails": ("query", "max_results"),
+    "read_email": ("email_id",),
+    "create_email_draft": ("to", "subject", "body"),
+    "send_email": ("to", "subject", "body"),
+
+    # Windows OS tools
+    "open_application": ("app_name",),
+    "close_application": ("app_name",),
+    "run_powershell": ("command",),
+    "manage_files": ("action", "path"),
+
+    # Voice tools
+    "transcribe_audio": ("audio_path",),
+    "synthesize_speech": ("text", "output_path"),
+})
+
+AVAILABLE_TOOL_NAMES: Final[Tuple[str, ...]] = tuple(AVAILABLE_TOOLS)
 
 
 class ToolCallParser:
@@ -11,45 +71,7 @@ class ToolCallParser:
     """
     
     def __init__(self):
-        self.available_tools = {
-            # Memory tools
-            "save_conversation": ["conversation_id", "messages"],
-            "get_user_preferences": ["user_id"],
-            "log_interaction": ["user_id", "interaction_type", "metadata"],
-            "get_task_history": ["user_id", "limit"],
-            
-            # Vector DB tools
-            "store_embedding": ["text", "metadata"],
-            "semantic_search": ["query", "limit"],
-            "retrieve_context": ["query", "limit"],
-            
-            # Telegram tools
-            "send_telegram_message": ["message", "chat_id"],
-            "get_telegram_updates": [],
-            "send_telegram_notification": ["message"],
-            
-            # Calendar tools
-            "list_calendar_events": ["start_date", "end_date"],
-            "create_calendar_event": ["title", "start_time", "end_time", "description"],
-            "update_calendar_event": ["event_id", "updates"],
-            "delete_calendar_event": ["event_id"],
-            
-            # Gmail tools
-            "list_emails": ["query", "max_results"],
-            "read_email": ["email_id"],
-            "create_email_draft": ["to", "subject", "body"],
-            "send_email": ["to", "subject", "body"],
-            
-            # Windows OS tools
-            "open_application": ["app_name"],
-            "close_application": ["app_name"],
-            "run_powershell": ["command"],
-            "manage_files": ["action", "path"],
-            
-            # Voice tools
-            "transcribe_audio": ["audio_path"],
-            "synthesize_speech": ["text", "output_path"],
-        }
+        self.available_tools = AVAILABLE_TOOLS
     
     def parse(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -69,7 +91,7 @@ class ToolCallParser:
                 if validated_call:
                     validated_calls.append(validated_call)
             except Exception as e:
-                print(f"Error validating tool call: {e}")
+                log.warning("Error validating tool call: %s", e)
                 continue
         
         return validated_calls
@@ -92,23 +114,17 @@ class ToolCallParser:
         if tool_name not in self.available_tools:
             raise ValueError(f"Unknown tool: {tool_name}")
         
+        # Listed parameters are not enforced since some are optional
         parameters = call.get("parameters", {})
-        required_params = self.available_tools[tool_name]
-        
-        # Check required parameters
-        for param in required_params:
-            if param not in parameters:
-                # Some parameters might be optional
-                pass
         
         return {
             "tool": tool_name,
             "parameters": parameters
         }
     
-    def get_available_tools(self) -> List[str]:
-        """Get list of available tool names"""
-        return list(self.available_tools.keys())
+    def get_available_tools(self) -> Tuple[str, ...]:
+        """Get available tool names"""
+        return AVAILABLE_TOOL_NAMES
     
     def get_tool_schema(self, tool_name: str) -> Dict[str, Any]:
         """Get schema for a specific tool"""
@@ -117,5 +133,85 @@ class ToolCallParser:
         
         return {
             "name": tool_name,
-            "required_parameters": self.available_tools[tool_name]
+            "required_parameters": list(self.available_tools[tool_name])
         }
+
+
+class ToolCallScanner:
+    """
+    Extracts tool calls from a plan while it is still being streamed
+    
+    Each object of the plan's "tool_calls" array is returned as soon as its
+    closing brace arrives, so independent tools can start before the rest
+    of the plan has been generated. The buffer is scanned once, tracking
+    string and nesting state across deltas.
+    """
+    
+    __slots__ = ("_buffer", "_pos", "_in_array", "_done", "_depth", "_start", "_in_string", "_escape")
+    
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """
+        Consume a streamed delta
+        
+        Args:
+            delta: Next chunk of LLM output
+            
+        Returns:
+            Tool call dicts completed by this delta (unvalidated)
+        """
+        if self._done:
+            return []
+        
+        self._buffer += delta
+        buffer = self._buffer
+        
+        if not self._in_array:
+            match = _TOOL_CALLS_ARRAY.search(buffer, self._pos)
+            if match is None:
+                self._pos = max(len(buffer) - _ARRAY_LOOKBEHIND, 0)
+                return []
+            self._in_array = True
+            self._pos = match.end()
+        
+        calls = []
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._start >= 0:
+                    try:
+                        call = loads(buffer[self._start:i + 1])
+                    except ValueError:
+                        call = None
+                    if isinstance(call, dict):
+                        calls.append(call)
+                    self._start = -1
+            elif char == "]" and self._depth == 0:
+                self._done = True
+                break
+        
+        self._pos = len(buffer)
+        return calls
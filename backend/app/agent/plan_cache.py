@@ -0,0 +1,206 @@
+"""
+Planner Cache - Reuses plans for repeated or near-duplicate requests
+"""
+from typing import AbstractSet, Dict, List, Any, Optional, Callable, Awaitable, Sequence, Tuple
+from collections import OrderedDict
+import hashlib
+import math
+
+from app.utils.json_utils import dumps, loads
+
+
+class PlannerCache:
+    """
+    Two-tier cache in front of Planner.create_plan
+
+    Tier 1 is an exact-match dict keyed on a hash of the planner inputs,
+    including the conversation context. Tier 2 compares the embedding of
+    the user message against entries cached under the same conversation
+    scope and reuses a plan when cosine similarity exceeds a threshold.
+
+    Only plans that still need their tools run, and only call tools from
+    cacheable_tools, are stored. A replayed plan therefore never skips
+    the tools or returns a stale response, and it never repeats a side
+    effect such as sending an email.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+        max_entries: int = 256,
+        similarity_threshold: float = 0.93,
+        cacheable_tools: AbstractSet[str] = frozenset()
+    ):
+        """
+        Initialize planner cache
+
+        Args:
+            embed_fn: Optional async embedding function enabling the similarity tier
+            max_entries: Maximum number of cached plans per tier
+            similarity_threshold: Minimum cosine similarity for a near-duplicate hit
+            cacheable_tools: Tools without side effects; plans calling any
+                other tool are not cached
+        """
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.cacheable_tools = cacheable_tools
+
+        self._exact: "OrderedDict[str, str]" = OrderedDict()
+        self._similar: List[Tuple[str, List[float], float, str]] = []
+
+    @staticmethod
+    def make_key(
+        user_message: str,
+        observations: Optional[List[Any]] = None,
+        semantic_context: Optional[str] = None,
+        context: Optional[Sequence[Dict[str, str]]] = None
+    ) -> str:
+        """Build the exact-match cache key for a set of planner inputs"""
+        payload = dumps(
+            [user_message, observations or [], semantic_context or "", list(context or [])],
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_scope(context: Optional[Sequence[Dict[str, str]]] = None) -> str:
+        """
+        Build the similarity-tier scope for a conversation
+
+        Args:
+            context: Conversation messages before the current user message
+
+        Returns:
+            Hash of the conversation context; plans are only reused by
+            near-duplicate requests with the same scope
+        """
+        payload = dumps(list(context or []), sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, plan_result: Dict[str, Any]) -> bool:
+        """
+        Whether a plan may be cached and replayed
+
+        Args:
+            plan_result: Plan dict returned by the planner
+
+        Returns:
+            True for incomplete plans whose tool calls are all cacheable tools
+        """
+        if plan_result.get("is_complete"):
+            return False
+
+        tool_calls = plan_result.get("tool_calls")
+        if not tool_calls or not isinstance(tool_calls, list):
+            return False
+
+        return all(
+            isinstance(call, dict) and call.get("tool") in self.cacheable_tools
+            for call in tool_calls
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up an exact-match plan
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Copy of the cached plan or None
+        """
+        cached = self._exact.get(key)
+        if cached is None:
+            return None
+
+        self._exact.move_to_end(key)
+        plan = loads(cached)
+        return plan if self.is_cacheable(plan) else None
+
+    async def get_similar(self, text: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Look up a plan for a semantically similar request
+
+        Args:
+            text: User message to compare
+            scope: Scope from make_scope; only entries with the same scope match
+
+        Returns:
+            Copy of the closest cached plan above threshold or None
+        """
+        if not self.embed_fn or not any(entry[0] == scope for entry in self._similar):
+            return None
+
+        query = await self.embed_fn(text)
+        query_norm = _norm(query)
+        if not query_norm:
+            return None
+
+        best_score = 0.0
+        best_plan = None
+        for entry_scope, embedding, norm, plan in self._similar:
+            if entry_scope != scope:
+                continue
+            score = _dot(query, embedding) / (query_norm * norm)
+            if score > best_score:
+                best_score, best_plan = score, plan
+
+        if best_plan is None or best_score < self.similarity_threshold:
+            return None
+
+        plan = loads(best_plan)
+        return plan if self.is_cacheable(plan) else None
+
+    async def put(
+        self,
+        key: str,
+        plan_result: Dict[str, Any],
+        text: Optional[str] = None,
+        scope: str = ""
+    ) -> None:
+        """
+        Store a plan, unless is_cacheable rejects it
+
+        Args:
+            key: Key from make_key
+            plan_result: Plan dict returned by the planner
+            text: Optional user message to index in the similarity tier
+            scope: Scope from make_scope for the similarity tier
+        """
+        if not self.is_cacheable(plan_result):
+            return
+
+        try:
+            serialized = dumps(plan_result)
+        except (TypeError, ValueError):
+            # Only JSON-serializable plans are cached
+            return
+
+        self._exact[key] = serialized
+        self._exact.move_to_end(key)
+        if len(self._exact) > self.max_entries:
+            self._exact.popitem(last=False)
+
+        if text and self.embed_fn:
+            embedding = await self.embed_fn(text)
+            norm = _norm(embedding)
+            if norm:
+                self._similar.append((scope, embedding, norm, serialized))
+                if len(self._similar) > self.max_entries:
+                    self._similar.pop(0)
+
+    def clear(self) -> None:
+        """Clear all cached plans"""
+        self._exact.clear()
+        self._similar.clear()
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    """Dot product of two vectors"""
+    return math.fsum(x * y for x, y in zip(a, b))
+
+
+def _norm(vector: List[float]) -> float:
+    """Euclidean norm of a vector"""
+    return math.sqrt(_dot(vector, vector))
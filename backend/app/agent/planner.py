@@ -1,11 +1,35 @@
 """
 Task Planner - Creates execution plans
 """
-from typing import Dict, List, Any, Optional
-import json
+from typing import Dict, List, Any, Optional, AsyncIterator, Iterable, Mapping, Sequence
+from collections import deque
+from itertools import islice
+import asyncio
+import logging
 
 from app.llm.ollama_client import OllamaClient
-from app.llm.prompts import PLANNER_SYSTEM_PROMPT, PLANNER_USER_TEMPLATE
+from app.llm.prompts import PLANNER_SYSTEM_PROMPT, render_planner_user
+from app.utils.async_utils import iter_with_deadline
+from app.utils.json_utils import extract_json
+
+
+log = logging.getLogger(__name__)
+
+# Number of most recent conversation messages included in the planner prompt
+CONTEXT_WINDOW = 5
+
+
+def format_observation(index: int, observation: Any) -> str:
+    """Format a single observation line for the planner prompt"""
+    return f"Observation {index}: {observation}"
+
+
+def _recent(context: Sequence[Mapping[str, str]]) -> Iterable[Mapping[str, str]]:
+    """Last CONTEXT_WINDOW messages of a conversation, without copying the rest"""
+    if isinstance(context, deque):
+        # Callers keep these bounded, so skipping ahead is cheap
+        return islice(context, max(len(context) - CONTEXT_WINDOW, 0), None)
+    return context[-CONTEXT_WINDOW:]
 
 
 class Planner:
@@ -19,9 +43,10 @@ class Planner:
     async def create_plan(
         self,
         user_message: str,
-        context: Optional[List[Dict[str, str]]] = None,
+        context: Optional[Sequence[Mapping[str, str]]] = None,
         observations: Optional[List[str]] = None,
-        semantic_context: Optional[str] = None
+        semantic_context: Optional[str] = None,
+        observations_text: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create an execution plan for the user's request
@@ -31,57 +56,127 @@ class Planner:
             context: Conversation history
             observations: Previous observations from tool executions
             semantic_context: Optional relevant context from semantic memory (RAG)
+            observations_text: Optional pre-rendered observations, used instead of observations
             
         Returns:
             Dict containing plan, tool calls, and completion status
         """
+        user_prompt = self._build_user_prompt(
+            user_message, context, observations, semantic_context, observations_text
+        )
+        
+        # Get plan from LLM; the deadline also covers time queued in the client
+        try:
+            async with asyncio.timeout(self.llm.timeout):
+                response = await self.llm.generate(
+                    prompt=user_prompt,
+                    system_prompt=PLANNER_SYSTEM_PROMPT,
+                    temperature=0.7
+                )
+        except TimeoutError:
+            log.warning("Planner LLM call timed out after %ss", self.llm.timeout)
+            return self._error_plan()
+        
+        return self._to_plan(response)
+    
+    async def stream_plan(
+        self,
+        user_message: str,
+        context: Optional[Sequence[Mapping[str, str]]] = None,
+        observations: Optional[List[str]] = None,
+        semantic_context: Optional[str] = None,
+        observations_text: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Create an execution plan, streaming LLM tokens as they arrive
+        
+        Args:
+            Same as create_plan
+            
+        Yields:
+            {"type": "plan_token", "data": str} events while generating,
+            then one {"type": "plan", "data": dict} event with the parsed plan
+            (the fallback plan if generation exceeds the client timeout)
+        """
+        user_prompt = self._build_user_prompt(
+            user_message, context, observations, semantic_context, observations_text
+        )
+        
+        # The deadline covers the whole generation, including time queued in the client
+        chunks = []
+        try:
+            async for delta in iter_with_deadline(
+                self.llm.stream_generate(
+                    prompt=user_prompt,
+                    system_prompt=PLANNER_SYSTEM_PROMPT,
+                    temperature=0.7
+                ),
+                self.llm.timeout
+            ):
+                chunks.append(delta)
+                yield {"type": "plan_token", "data": delta}
+        except TimeoutError:
+            log.warning("Planner LLM stream timed out after %ss", self.llm.timeout)
+            yield {"type": "plan", "data": self._error_plan()}
+            return
+        
+        yield {"type": "plan", "data": self._to_plan("".join(chunks))}
+    
+    def _build_user_prompt(
+        self,
+        user_message: str,
+        context: Optional[Sequence[Mapping[str, str]]],
+        observations: Optional[List[str]],
+        semantic_context: Optional[str],
+        observations_text: Optional[str]
+    ) -> str:
+        """Build the planner user prompt"""
         # Build context string
         context_str = ""
         if context:
             context_str = "\n".join([
                 f"{msg['role']}: {msg['content']}"
-                for msg in context[-5:]  # Last 5 messages
+                for msg in _recent(context)
             ])
         
         # Build observations string
-        observations_str = ""
-        if observations:
+        observations_str = observations_text or ""
+        if not observations_str and observations:
             observations_str = "\n".join([
-                f"Observation {i+1}: {obs}"
+                format_observation(i + 1, obs)
                 for i, obs in enumerate(observations)
             ])
         
-        # Build semantic context string
+        # Build semantic context section
         semantic_str = ""
         if semantic_context:
-            semantic_str = f"\n\nRelevant Context from Memory:\n{semantic_context}"
+            semantic_str = f"Relevant Context from Memory:\n{semantic_context}\n\n"
         
         # Format user prompt
-        user_prompt = PLANNER_USER_TEMPLATE.format(
-            user_message=user_message,
-            context=context_str if context_str else "No previous context",
-            observations=observations_str if observations_str else "No previous observations"
-        ) + semantic_str
-        
-        # Get plan from LLM
-        response = await self.llm.generate(
-            prompt=user_prompt,
-            system_prompt=PLANNER_SYSTEM_PROMPT,
-            temperature=0.7
+        return render_planner_user(
+            user_message,
+            context_str if context_str else "No previous context",
+            observations_str if observations_str else "No previous observations",
+            semantic_str
         )
-        
-        # Parse response
+    
+    def _to_plan(self, response: str) -> Dict[str, Any]:
+        """Parse a raw LLM response, falling back to an error plan"""
         try:
             plan_data = self._parse_plan_response(response)
             return plan_data
         except Exception as e:
-            print(f"Error parsing plan: {e}")
-            return {
-                "plan": "Unable to create plan",
-                "is_complete": False,
-                "tool_calls": [],
-                "response": "I encountered an error while planning. Please try again."
-            }
+            log.warning("Error parsing plan: %s", e)
+            return self._error_plan()
+    
+    def _error_plan(self) -> Dict[str, Any]:
+        """Fallback plan when no usable plan could be produced"""
+        return {
+            "plan": "Unable to create plan",
+            "is_complete": False,
+            "tool_calls": [],
+            "response": "I encountered an error while planning. Please try again."
+        }
     
     def _parse_plan_response(self, response: str) -> Dict[str, Any]:
         """
@@ -102,19 +197,7 @@ class Planner:
         """
         # Try to extract JSON from response
         try:
-            # Look for JSON block
-            if "```json" in response:
-                json_start = response.find("```json") + 7
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "{" in response and "}" in response:
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-            else:
-                raise ValueError("No JSON found in response")
-            
-            plan_data = json.loads(json_str)
+            plan_data = extract_json(response)
             
             # Validate required fields
             if "plan" not in plan_data:
@@ -127,7 +210,7 @@ class Planner:
             return plan_data
             
         except Exception as e:
-            print(f"JSON parsing error: {e}")
+            log.debug("JSON parsing error: %s", e)
             # Fallback: treat as simple response
             return {
                 "plan": "Direct response",
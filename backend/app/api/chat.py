@@ -1,29 +1,36 @@
 """
 Enhanced Chat API endpoints with memory integration
 """
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy.orm import Session
 from typing import List, Optional
-import uuid
+import asyncio
+import logging
 
 from app.llm.ollama_client import OllamaClient
 from app.agent.enhanced_core import EnhancedAgent
+from app.config import settings
+from app.deps import get_ollama, get_enhanced_agent
+from app.models.database import get_db
 
 router = APIRouter()
 
-# Global instances (will be properly initialized in lifespan)
-llm_client = OllamaClient()
-agent = EnhancedAgent(llm_client, enable_semantic_memory=True)
+log = logging.getLogger(__name__)
 
 
 class Message(BaseModel):
     """Message model"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     role: str
     content: str
 
 
 class ChatRequest(BaseModel):
     """Chat request model"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     message: str
     conversation_id: Optional[str] = None
     user_id: str = "default_user"
@@ -32,6 +39,8 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     """Chat response model"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     response: str
     conversation_id: str
     iterations: int
@@ -39,8 +48,12 @@ class ChatResponse(BaseModel):
     memory_stats: Optional[dict] = None
 
 
-@router.post("/send", response_model=ChatResponse)
-async def send_message(request: ChatRequest):
+@router.post("/send", response_model=ChatResponse, response_model_exclude_none=True)
+async def send_message(
+    request: ChatRequest,
+    agent: EnhancedAgent = Depends(get_enhanced_agent),
+    db: Session = Depends(get_db)
+):
     """
     Send a message to JARVIS with memory integration
     
@@ -51,16 +64,15 @@ async def send_message(request: ChatRequest):
         Chat response with agent's reply and memory stats
     """
     try:
-        # Generate conversation ID if not provided
-        conversation_id = request.conversation_id or str(uuid.uuid4())
-        
-        # Run enhanced agent
-        result = await agent.run(
-            user_message=request.message,
-            conversation_id=conversation_id,
-            user_id=request.user_id,
-            use_semantic_memory=request.use_semantic_memory
-        )
+        # Run enhanced agent (generates a conversation ID if not provided)
+        async with asyncio.timeout(settings.agent_message_timeout or None):
+            result = await agent.run(
+                user_message=request.message,
+                conversation_id=request.conversation_id,
+                user_id=request.user_id,
+                use_semantic_memory=request.use_semantic_memory,
+                db=db
+            )
         
         return ChatResponse(
             response=result["response"],
@@ -70,13 +82,21 @@ async def send_message(request: ChatRequest):
             memory_stats=result.get("memory_stats")
         )
         
+    except TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Request timed out after {settings.agent_message_timeout}s"
+        )
     except Exception as e:
-        print(f"Error in chat endpoint: {e}")
+        log.exception("Error in chat endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.delete("/conversation/{conversation_id}")
-async def clear_conversation(conversation_id: str):
+async def clear_conversation(
+    conversation_id: str,
+    agent: EnhancedAgent = Depends(get_enhanced_agent)
+):
     """
     Clear a conversation from short-term memory
     
@@ -94,7 +114,10 @@ async def clear_conversation(conversation_id: str):
 
 
 @router.get("/health")
-async def chat_health():
+async def chat_health(
+    llm_client: OllamaClient = Depends(get_ollama),
+    agent: EnhancedAgent = Depends(get_enhanced_agent)
+):
     """Check chat service health"""
     ollama_healthy = await llm_client.check_health()
     
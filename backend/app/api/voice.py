@@ -3,17 +3,45 @@ Enhanced Voice API endpoints with STT and TTS integration
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, BinaryIO
+import asyncio
+import contextlib
 import os
+import shutil
 import tempfile
-import uuid
 
 router = APIRouter()
 
+# Chunk size for streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+
+def _save_upload(source: BinaryIO, prefix: str) -> str:
+    """
+    Stream an uploaded file to a new temporary file in fixed-size chunks
+    
+    Args:
+        source: Uploaded file object
+        prefix: Temporary file name prefix
+        
+    Returns:
+        Path of the temporary file (caller removes it)
+    """
+    with tempfile.NamedTemporaryFile(delete=False, prefix=prefix, suffix=".wav") as f:
+        try:
+            shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+        return f.name
+
 
 class TranscribeResponse(BaseModel):
     """Transcription response model"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     success: bool
     text: Optional[str] = None
     language: Optional[str] = None
@@ -23,6 +51,8 @@ class TranscribeResponse(BaseModel):
 
 class SynthesizeRequest(BaseModel):
     """TTS request model"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     text: str
     language: Optional[str] = "en"
     speaker: Optional[str] = None
@@ -30,6 +60,8 @@ class SynthesizeRequest(BaseModel):
 
 class VoiceChatResponse(BaseModel):
     """Voice chat response model"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     success: bool
     transcribed_text: Optional[str] = None
     ai_response: Optional[str] = None
@@ -37,7 +69,7 @@ class VoiceChatResponse(BaseModel):
     error: Optional[str] = None
 
 
-@router.post("/transcribe", response_model=TranscribeResponse)
+@router.post("/transcribe", response_model=TranscribeResponse, response_model_exclude_none=True)
 async def transcribe_audio(audio: UploadFile = File(...)):
     """
     Transcribe audio to text using Speech-to-Text
@@ -51,12 +83,8 @@ async def transcribe_audio(audio: UploadFile = File(...)):
     temp_path = None
     
     try:
-        # Save uploaded file temporarily
-        temp_path = os.path.join(tempfile.gettempdir(), f"upload_{uuid.uuid4()}.wav")
-        
-        with open(temp_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
+        # Save uploaded file temporarily, without buffering it in memory
+        temp_path = await asyncio.to_thread(_save_upload, audio.file, "upload_")
         
         # TODO: Call MCP Voice Server for transcription
         return TranscribeResponse(
@@ -69,8 +97,9 @@ async def transcribe_audio(audio: UploadFile = File(...)):
         
     finally:
         # Cleanup temp file
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        if temp_path:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_path)
 
 
 @router.post("/synthesize")
@@ -95,7 +124,7 @@ async def synthesize_speech(request: SynthesizeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/chat", response_model=VoiceChatResponse)
+@router.post("/chat", response_model=VoiceChatResponse, response_model_exclude_none=True)
 async def voice_chat(
     audio: UploadFile = File(...),
     conversation_id: Optional[str] = None
@@ -113,15 +142,8 @@ async def voice_chat(
     temp_audio_path = None
     
     try:
-        # Save uploaded audio
-        temp_audio_path = os.path.join(
-            tempfile.gettempdir(),
-            f"voice_chat_{uuid.uuid4()}.wav"
-        )
-        
-        with open(temp_audio_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
+        # Save uploaded audio, without buffering it in memory
+        temp_audio_path = await asyncio.to_thread(_save_upload, audio.file, "voice_chat_")
         
         # TODO: Full voice chat flow
         # 1. Transcribe audio (STT)
@@ -138,8 +160,9 @@ async def voice_chat(
         
     finally:
         # Cleanup
-        if temp_audio_path and os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
+        if temp_audio_path:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_audio_path)
 
 
 @router.get("/voices")
@@ -1,27 +1,43 @@
 """
 WebSocket API for real-time chat
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Set
-import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+from typing import Any, Dict
+import asyncio
+import logging
 import uuid
 
-from app.llm.ollama_client import OllamaClient
 from app.agent.core import Agent
+from app.config import settings
+from app.deps import get_agent
+from app.utils.json_utils import dumps, loads
 
 router = APIRouter()
 
-# Active connections
-active_connections: Set[WebSocket] = set()
+log = logging.getLogger(__name__)
 
-# Global instances
-llm_client = OllamaClient()
-agent = Agent(llm_client)
+# Static frames, serialized once
+_PROCESSING_FRAME = dumps({"type": "processing", "status": "processing"})
+_PONG_FRAME = dumps({"type": "pong"})
+
+
+def _connection_frame(client_id: str) -> str:
+    """Welcome frame; client IDs are hex strings, so no escaping is needed"""
+    return f'{{"type":"connection","status":"connected","client_id":"{client_id}"}}'
+
+
+# Agent token events forwarded as {"type": "token"} frames, by phase
+_TOKEN_PHASES = {
+    "plan_token": "plan",
+    "observation_token": "observation"
+}
 
 
 class ConnectionManager:
     """Manages WebSocket connections"""
     
+    __slots__ = ("active_connections",)
+    
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
     
@@ -32,87 +48,131 @@ class ConnectionManager:
     
     def disconnect(self, client_id: str):
         """Remove connection"""
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
+        self.active_connections.pop(client_id, None)
     
     async def send_message(self, client_id: str, message: dict):
         """Send message to specific client"""
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
-            await websocket.send_json(message)
+        websocket = self.active_connections.get(client_id)
+        if websocket is not None:
+            await websocket.send_text(dumps(message))
+    
+    async def send_frame(self, client_id: str, frame: str):
+        """Send an already serialized frame to specific client"""
+        websocket = self.active_connections.get(client_id)
+        if websocket is not None:
+            await websocket.send_text(frame)
 
 
 manager = ConnectionManager()
 
 
+async def _handle_chat(client_id: str, agent: Agent, data: Dict[str, Any]):
+    """Run the agent for one chat message and stream its progress to the client"""
+    user_message = data.get("message")
+    conversation_id = data.get("conversation_id", str(uuid.uuid4()))
+    context = data.get("context")
+    
+    # Send acknowledgment
+    await manager.send_frame(client_id, _PROCESSING_FRAME)
+    
+    try:
+        # Run agent, forwarding LLM tokens and tool activity as they happen;
+        # the deadline only aborts this message, not the connection
+        result: Dict[str, Any] = {}
+        async with asyncio.timeout(settings.agent_message_timeout or None):
+            async for event in agent.run_stream(
+                user_message=user_message,
+                conversation_id=conversation_id,
+                context=context
+            ):
+                event_type = event["type"]
+                if event_type in _TOKEN_PHASES:
+                    await manager.send_message(client_id, {
+                        "type": "token",
+                        "phase": _TOKEN_PHASES[event_type],
+                        "delta": event["data"]
+                    })
+                elif event_type == "tool_call":
+                    await manager.send_message(client_id, {
+                        "type": "tool_call",
+                        "tool": event["data"]["tool"]
+                    })
+                elif event_type == "final":
+                    result = event["data"]
+        
+        # Send response
+        await manager.send_message(client_id, {
+            "type": "response",
+            "response": result["response"],
+            "conversation_id": result["conversation_id"],
+            "iterations": result["iterations"],
+            "plan": result.get("plan")
+        })
+        
+    except TimeoutError:
+        await manager.send_message(client_id, {
+            "type": "error",
+            "error": f"Request timed out after {settings.agent_message_timeout}s"
+        })
+    
+    except Exception as e:
+        # Send error
+        await manager.send_message(client_id, {
+            "type": "error",
+            "error": str(e)
+        })
+
+
+async def _chat_worker(client_id: str, agent: Agent, queue: asyncio.Queue):
+    """Handle a connection's chat messages one at a time, in arrival order"""
+    while True:
+        data = await queue.get()
+        await _handle_chat(client_id, agent, data)
+
+
 @router.websocket("/chat")
-async def websocket_chat(websocket: WebSocket):
+async def websocket_chat(
+    websocket: WebSocket,
+    agent: Agent = Depends(get_agent)
+):
     """
     WebSocket endpoint for real-time chat
+    
+    Chat messages are queued to one worker task per connection, so their
+    frames never interleave and the socket keeps answering pings while the
+    agent works. The worker and its in-flight message are cancelled when
+    the client disconnects.
     """
-    client_id = str(uuid.uuid4())
+    client_id = uuid.uuid4().hex
     await manager.connect(websocket, client_id)
     
     try:
         # Send welcome message
-        await manager.send_message(client_id, {
-            "type": "connection",
-            "status": "connected",
-            "client_id": client_id
-        })
+        await manager.send_frame(client_id, _connection_frame(client_id))
         
-        while True:
-            # Receive message
-            data = await websocket.receive_json()
-            
-            message_type = data.get("type")
+        chat_queue: asyncio.Queue = asyncio.Queue()
+        
+        async with asyncio.TaskGroup() as tasks:
+            tasks.create_task(_chat_worker(client_id, agent, chat_queue))
             
-            if message_type == "chat":
-                # Process chat message
-                user_message = data.get("message")
-                conversation_id = data.get("conversation_id", str(uuid.uuid4()))
-                context = data.get("context", [])
+            while True:
+                # Receive message
+                data = loads(await websocket.receive_text())
                 
-                # Send acknowledgment
-                await manager.send_message(client_id, {
-                    "type": "processing",
-                    "status": "processing"
-                })
+                message_type = data.get("type")
                 
-                try:
-                    # Run agent
-                    result = await agent.run(
-                        user_message=user_message,
-                        conversation_id=conversation_id,
-                        context=context
-                    )
-                    
-                    # Send response
-                    await manager.send_message(client_id, {
-                        "type": "response",
-                        "response": result["response"],
-                        "conversation_id": result["conversation_id"],
-                        "iterations": result["iterations"],
-                        "plan": result.get("plan")
-                    })
-                    
-                except Exception as e:
-                    # Send error
-                    await manager.send_message(client_id, {
-                        "type": "error",
-                        "error": str(e)
-                    })
-            
-            elif message_type == "ping":
-                # Respond to ping
-                await manager.send_message(client_id, {
-                    "type": "pong"
-                })
+                if message_type == "chat":
+                    # Process chat message after any earlier ones
+                    chat_queue.put_nowait(data)
+                
+                elif message_type == "ping":
+                    # Respond to ping
+                    await manager.send_frame(client_id, _PONG_FRAME)
     
-    except WebSocketDisconnect:
+    except* WebSocketDisconnect:
         manager.disconnect(client_id)
-        print(f"Client {client_id} disconnected")
+        log.info("Client %s disconnected", client_id)
     
-    except Exception as e:
-        print(f"WebSocket error: {e}")
+    except* Exception as group:
+        log.error("WebSocket error: %s", group.exceptions[0], exc_info=group)
         manager.disconnect(client_id)
@@ -28,10 +28,21 @@ class Settings(BaseSettings):
     ollama_model: str = "llama3.1:8b"
     ollama_embedding_model: str = "nomic-embed-text"
     ollama_timeout: int = 120
+    ollama_keep_alive: str = "30m"
+    ollama_embedding_cache_size: int = 4096  # In-memory embeddings; 0 disables the cache
+    ollama_embedding_cache_path: str = "./embedding_cache.db"  # Empty keeps embeddings in memory only
     
     # Database Configuration
     database_url: str = "sqlite:///./jarvis.db"
     vector_db_path: str = "./chroma_db"
+    # HNSW index of new semantic memory collections; the distance space only
+    # applies when a collection is created (see SemanticMemory.hard_reset)
+    vector_db_hnsw_space: str = "ip"  # Embeddings are stored unit-length, so ip == cosine
+    vector_db_hnsw_m: int = 24
+    vector_db_hnsw_construction_ef: int = 128
+    vector_db_hnsw_search_ef: int = 100
+    vector_db_hnsw_batch_size: int = 1000
+    vector_db_hnsw_sync_threshold: int = 2000
     
     # Google API
     google_calendar_credentials_path: Optional[str] = None
@@ -54,6 +65,22 @@ class Settings(BaseSettings):
     mcp_windows_os_url: str = "http://localhost:8006"
     mcp_voice_url: str = "http://localhost:8007"
     
+    # Tool Execution
+    tool_concurrency: int = 5
+    tool_server_concurrency: int = 5
+    tool_phase_timeout: float = 45.0  # Seconds before slow tools are abandoned; 0 waits forever
+    
+    # Outbound HTTP pool (shared by the Ollama and MCP clients)
+    http_pool_size: int = 100  # Total connections; 0 means unlimited
+    http_pool_size_per_host: int = 32  # Per Ollama/MCP host; keep >= tool_server_concurrency
+    http_keepalive_timeout: float = 60.0  # Seconds an idle connection is kept open
+    
+    # Health Checks
+    health_check_ttl: float = 5.0  # Seconds a probe result is reused; 0 probes every time
+    
+    # Agent
+    agent_message_timeout: float = 600.0  # Seconds per chat message (REST and WebSocket); 0 waits forever
+    
     # CORS
     cors_origins: str = "http://localhost:3000,http://localhost:3001"
     
@@ -0,0 +1,24 @@
+"""
+FastAPI dependencies for shared application resources
+"""
+from starlette.requests import HTTPConnection
+
+from app.llm.ollama_client import OllamaClient
+from app.agent.core import Agent
+from app.agent.enhanced_core import EnhancedAgent
+
+
+def get_ollama(conn: HTTPConnection) -> OllamaClient:
+    """Shared Ollama client created in the application lifespan"""
+    return conn.app.state.ollama
+
+
+def get_agent(conn: HTTPConnection) -> Agent:
+    """Shared core agent (used by the WebSocket chat)"""
+    return conn.app.state.agent
+
+
+def get_enhanced_agent(conn: HTTPConnection) -> EnhancedAgent:
+    """Shared memory-enabled agent (used by the REST chat)"""
+    return conn.app.state.enhanced_agent
+
@@ -0,0 +1,130 @@
+"""
+LLM Caches - Reuse embeddings for repeated texts
+"""
+from typing import Optional, List
+from collections import OrderedDict
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+
+
+log = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings
+    
+    Embeddings are deterministic for a given model, so they are kept in an
+    in-process LRU and, when a path is given, persisted to SQLite as
+    float32 blobs so they survive restarts.
+    """
+    
+    def __init__(self, path: Optional[str] = None, max_entries: int = 4096):
+        """
+        Initialize embedding cache
+        
+        Args:
+            path: Optional SQLite file for the persistent tier
+            max_entries: Maximum number of embeddings kept in memory
+        """
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+    
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        """Build a cache key for a model and input text"""
+        return hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=16).digest()
+    
+    async def get(self, key: bytes) -> Optional[List[float]]:
+        """
+        Look up an embedding
+        
+        Args:
+            key: Key from make_key
+            
+        Returns:
+            Embedding or None
+        """
+        embedding = self._memory.get(key)
+        if embedding is not None:
+            self._memory.move_to_end(key)
+            return embedding
+        
+        if self._db is None:
+            return None
+        
+        try:
+            blob = await asyncio.to_thread(self._read, key)
+        except sqlite3.Error as e:
+            log.warning("Embedding cache read failed: %s", e)
+            return None
+        if blob is None:
+            return None
+        
+        embedding = np.frombuffer(blob, dtype=np.float32).tolist()
+        self._remember(key, embedding)
+        return embedding
+    
+    async def put(self, key: bytes, embedding: List[float]) -> None:
+        """
+        Store an embedding
+        
+        Args:
+            key: Key from make_key
+            embedding: Embedding values
+        """
+        self._remember(key, embedding)
+        
+        if self._db is None:
+            return
+        
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        try:
+            await asyncio.to_thread(self._write, key, blob)
+        except sqlite3.Error as e:
+            log.warning("Embedding cache write failed: %s", e)
+    
+    def close(self) -> None:
+        """Close the persistent tier"""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+    
+    def _remember(self, key: bytes, embedding: List[float]) -> None:
+        """Insert into the in-memory LRU"""
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _read(self, key: bytes) -> Optional[bytes]:
+        """Read a vector blob (runs in a worker thread)"""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def _write(self, key: bytes, blob: bytes) -> None:
+        """Write a vector blob (runs in a worker thread)"""
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", (key, blob)
+            )
+            self._db.commit()
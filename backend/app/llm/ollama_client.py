@@ -1,11 +1,50 @@
 """
 Ollama Client - Interface to Ollama LLM
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
+import asyncio
+import logging
 import aiohttp
-import json
 
 from app.config import settings
+from app.llm.cache import EmbeddingCache
+from app.utils.cache_utils import HealthCache
+from app.utils.json_utils import JSON_HEADERS, dumpb, loads
+
+
+log = logging.getLogger(__name__)
+
+
+# Read size for streamed NDJSON responses
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Concurrent single-text requests when /api/embed is unavailable
+EMBED_BATCH_CONCURRENCY = 8
+
+# Distinct temperatures whose "options" dicts are reused across requests
+MAX_CACHED_OPTIONS = 16
+
+
+async def _iter_ndjson(response: aiohttp.ClientResponse) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Decode a newline-delimited JSON stream
+    
+    Frames are split out of a bytes buffer filled in large chunks, which
+    avoids the per-line overhead (and line length limit) of iterating
+    response.content directly.
+    """
+    buffer = bytearray()
+    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            if end > start:
+                yield loads(bytes(buffer[start:end]))
+            start = end + 1
+        del buffer[:start]
+    
+    if buffer.strip():
+        yield loads(bytes(buffer))
 
 
 class OllamaClient:
@@ -17,12 +56,44 @@ class OllamaClient:
         self,
         base_url: Optional[str] = None,
         model: Optional[str] = None,
-        timeout: int = 120
+        timeout: int = 120,
+        keep_alive: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None
     ):
+        """
+        Initialize Ollama client
+        
+        Args:
+            base_url: Ollama server URL
+            model: Generation model name
+            timeout: Request timeout in seconds for a client-owned session
+            keep_alive: How long Ollama keeps the model loaded
+            session: Optional shared session; it is not closed by close()
+        """
         self.base_url = base_url or settings.ollama_base_url
         self.model = model or settings.ollama_model
         self.timeout = timeout
-        self.session: Optional[aiohttp.ClientSession] = None
+        # Keep the model loaded between requests so Ollama can reuse the
+        # KV cache of the shared system prompt prefix
+        self.keep_alive = keep_alive or settings.ollama_keep_alive
+        self.session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
+        
+        self.embedding_cache: Optional[EmbeddingCache] = (
+            EmbeddingCache(
+                settings.ollama_embedding_cache_path or None,
+                max_entries=settings.ollama_embedding_cache_size
+            )
+            if settings.ollama_embedding_cache_size > 0 else None
+        )
+        self._health = HealthCache(settings.health_check_ttl)
+        
+        # Request fields that never change for this client, and shared
+        # "options" dicts per temperature; neither is mutated after creation
+        self._base_payload: Dict[str, Any] = {"model": self.model, "keep_alive": self.keep_alive}
+        self._options_by_temperature: Dict[float, Dict[str, Any]] = {}
+        # Cleared once Ollama answers 404 for the batch /api/embed endpoint
+        self._batch_embed_supported = True
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session"""
@@ -30,12 +101,15 @@ class OllamaClient:
             self.session = aiohttp.ClientSession(
                 timeout=aiohttp.ClientTimeout(total=self.timeout)
             )
+            self._owns_session = True
         return self.session
     
     async def close(self):
-        """Close the session"""
-        if self.session and not self.session.closed:
+        """Close the session if this client created it, and the embedding cache"""
+        if self._owns_session and self.session and not self.session.closed:
             await self.session.close()
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
     
     async def generate(
         self,
@@ -58,49 +132,77 @@ class OllamaClient:
         Returns:
             Generated text
         """
-        session = await self._get_session()
+        if stream:
+            # Same request as stream_generate, collected into one string
+            return "".join([
+                delta async for delta in self.stream_generate(
+                    prompt, system_prompt, temperature, max_tokens
+                )
+            ])
         
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": stream,
-            "options": {
-                "temperature": temperature,
-            }
-        }
+        session = await self._get_session()
         
+        payload = self._payload(False, temperature, max_tokens, prompt=prompt)
         if system_prompt:
             payload["system"] = system_prompt
         
-        if max_tokens:
-            payload["options"]["num_predict"] = max_tokens
-        
         try:
             async with session.post(
                 f"{self.base_url}/api/generate",
-                json=payload
+                data=dumpb(payload),
+                headers=JSON_HEADERS
             ) as response:
                 response.raise_for_status()
                 
-                if stream:
-                    # Handle streaming response
-                    full_response = ""
-                    async for line in response.content:
-                        if line:
-                            data = json.loads(line)
-                            if "response" in data:
-                                full_response += data["response"]
-                    return full_response
-                else:
-                    # Handle non-streaming response
-                    data = await response.json()
-                    return data.get("response", "")
+                data = loads(await response.read())
+                return data.get("response", "")
                     
         except aiohttp.ClientError as e:
-            print(f"Ollama API error: {e}")
+            log.error("Ollama API error: %s", e)
             raise
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            log.exception("Unexpected Ollama client error")
+            raise
+    
+    async def stream_generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate text completion, yielding tokens as they arrive
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            
+        Yields:
+            Generated text deltas
+        """
+        session = await self._get_session()
+        
+        payload = self._payload(True, temperature, max_tokens, prompt=prompt)
+        if system_prompt:
+            payload["system"] = system_prompt
+        
+        try:
+            async with session.post(
+                f"{self.base_url}/api/generate",
+                data=dumpb(payload),
+                headers=JSON_HEADERS
+            ) as response:
+                response.raise_for_status()
+                
+                async for data in _iter_ndjson(response):
+                    if data.get("response"):
+                        yield data["response"]
+                    
+        except aiohttp.ClientError as e:
+            log.error("Ollama API error: %s", e)
             raise
     
     async def chat(
@@ -122,44 +224,70 @@ class OllamaClient:
         Returns:
             Generated response
         """
-        session = await self._get_session()
+        if stream:
+            # Same request as stream_chat, collected into one string
+            return "".join([
+                delta async for delta in self.stream_chat(messages, temperature, max_tokens)
+            ])
         
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "stream": stream,
-            "options": {
-                "temperature": temperature,
-            }
-        }
+        session = await self._get_session()
         
-        if max_tokens:
-            payload["options"]["num_predict"] = max_tokens
+        payload = self._payload(False, temperature, max_tokens, messages=messages)
         
         try:
             async with session.post(
                 f"{self.base_url}/api/chat",
-                json=payload
+                data=dumpb(payload),
+                headers=JSON_HEADERS
             ) as response:
                 response.raise_for_status()
                 
-                if stream:
-                    full_response = ""
-                    async for line in response.content:
-                        if line:
-                            data = json.loads(line)
-                            if "message" in data and "content" in data["message"]:
-                                full_response += data["message"]["content"]
-                    return full_response
-                else:
-                    data = await response.json()
-                    return data.get("message", {}).get("content", "")
+                data = loads(await response.read())
+                return data.get("message", {}).get("content", "")
                     
         except aiohttp.ClientError as e:
-            print(f"Ollama API error: {e}")
+            log.error("Ollama API error: %s", e)
             raise
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            log.exception("Unexpected Ollama client error")
+            raise
+    
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Chat completion with conversation history, yielding tokens as they arrive
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            
+        Yields:
+            Generated text deltas
+        """
+        session = await self._get_session()
+        
+        payload = self._payload(True, temperature, max_tokens, messages=messages)
+        
+        try:
+            async with session.post(
+                f"{self.base_url}/api/chat",
+                data=dumpb(payload),
+                headers=JSON_HEADERS
+            ) as response:
+                response.raise_for_status()
+                
+                async for data in _iter_ndjson(response):
+                    content = data.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    
+        except aiohttp.ClientError as e:
+            log.error("Ollama API error: %s", e)
             raise
     
     async def embed(self, text: str) -> List[float]:
@@ -172,36 +300,170 @@ class OllamaClient:
         Returns:
             List of embedding values
         """
+        cache_key = None
+        if self.embedding_cache is not None:
+            cache_key = EmbeddingCache.make_key(settings.ollama_embedding_model, text)
+            cached = await self.embedding_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         session = await self._get_session()
         
         payload = {
             "model": settings.ollama_embedding_model,
-            "prompt": text
+            "prompt": text,
+            "keep_alive": self.keep_alive
         }
         
         try:
             async with session.post(
                 f"{self.base_url}/api/embeddings",
-                json=payload
+                data=dumpb(payload),
+                headers=JSON_HEADERS
             ) as response:
                 response.raise_for_status()
-                data = await response.json()
-                return data.get("embedding", [])
+                data = loads(await response.read())
+                embedding = data.get("embedding", [])
+                if cache_key is not None and embedding:
+                    await self.embedding_cache.put(cache_key, embedding)
+                return embedding
                 
         except aiohttp.ClientError as e:
-            print(f"Ollama API error: {e}")
+            log.error("Ollama API error: %s", e)
             raise
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            log.exception("Unexpected Ollama client error")
             raise
     
+    async def embed_batch(
+        self,
+        texts: List[str],
+        max_concurrency: int = EMBED_BATCH_CONCURRENCY
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for several texts
+        
+        Cached embeddings are reused and the rest are sent in one /api/embed
+        request. Ollama versions without that endpoint get concurrent
+        single-text embed() calls instead.
+        
+        Args:
+            texts: Texts to embed
+            max_concurrency: Maximum concurrent requests in the fallback
+            
+        Returns:
+            One list of embedding values per text, in order
+            
+        Raises:
+            ValueError: If Ollama returns a different number of embeddings
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        keys: List[Optional[bytes]] = [None] * len(texts)
+        
+        if self.embedding_cache is not None:
+            for i, text in enumerate(texts):
+                keys[i] = EmbeddingCache.make_key(settings.ollama_embedding_model, text)
+                embeddings[i] = await self.embedding_cache.get(keys[i])
+        
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+        
+        if self._batch_embed_supported:
+            try:
+                computed = await self._embed_many([texts[i] for i in missing])
+            except aiohttp.ClientResponseError as e:
+                if e.status != 404:
+                    log.error("Ollama API error: %s", e)
+                    raise
+                # Older Ollama without /api/embed
+                self._batch_embed_supported = False
+            except aiohttp.ClientError as e:
+                log.error("Ollama API error: %s", e)
+                raise
+            else:
+                for i, embedding in zip(missing, computed, strict=True):
+                    embeddings[i] = embedding
+                    if keys[i] is not None and embedding:
+                        await self.embedding_cache.put(keys[i], embedding)
+                return embeddings
+        
+        sem = asyncio.Semaphore(max_concurrency)
+        
+        async def embed_one(text: str) -> List[float]:
+            async with sem:
+                return await self.embed(text)
+        
+        computed = await asyncio.gather(*(embed_one(texts[i]) for i in missing))
+        for i, embedding in zip(missing, computed, strict=True):
+            embeddings[i] = embedding
+        return embeddings
+    
+    async def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts with a single /api/embed request"""
+        session = await self._get_session()
+        
+        payload = {
+            "model": settings.ollama_embedding_model,
+            "input": texts,
+            "keep_alive": self.keep_alive
+        }
+        
+        async with session.post(
+            f"{self.base_url}/api/embed",
+            data=dumpb(payload),
+            headers=JSON_HEADERS
+        ) as response:
+            response.raise_for_status()
+            data = loads(await response.read())
+        
+        embeddings = data.get("embeddings", [])
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs"
+            )
+        return embeddings
+    
+    def _payload(
+        self,
+        stream: bool,
+        temperature: float,
+        max_tokens: Optional[int],
+        **fields: Any
+    ) -> Dict[str, Any]:
+        """Request body for /api/generate or /api/chat, built on the client skeleton"""
+        payload = self._base_payload | fields
+        payload["stream"] = stream
+        if max_tokens:
+            payload["options"] = {"temperature": temperature, "num_predict": max_tokens}
+        else:
+            payload["options"] = self._options(temperature)
+        return payload
+    
+    def _options(self, temperature: float) -> Dict[str, Any]:
+        """Shared options dict for a temperature"""
+        options = self._options_by_temperature.get(temperature)
+        if options is None:
+            options = {"temperature": temperature}
+            # Callers use a handful of fixed temperatures; don't grow unbounded
+            if len(self._options_by_temperature) < MAX_CACHED_OPTIONS:
+                self._options_by_temperature[temperature] = options
+        return options
+    
     async def check_health(self) -> bool:
         """
         Check if Ollama is running and accessible
         
+        Results are reused for settings.health_check_ttl seconds and
+        concurrent callers share one in-flight probe.
+        
         Returns:
             True if healthy, False otherwise
         """
+        return await self._health.get(self.base_url, self._probe_health)
+    
+    async def _probe_health(self) -> bool:
+        """Query /api/tags once"""
         session = await self._get_session()
         
         try:
@@ -209,3 +471,22 @@ class OllamaClient:
                 return response.status == 200
         except Exception:
             return False
+    
+    async def warmup(self) -> None:
+        """
+        Load the chat model into memory ahead of the first request
+        
+        An empty prompt makes Ollama load the model and return without
+        generating; keep_alive then keeps it resident between requests.
+        """
+        session = await self._get_session()
+        
+        payload = self._base_payload | {"prompt": "", "stream": False}
+        
+        async with session.post(
+            f"{self.base_url}/api/generate",
+            data=dumpb(payload),
+            headers=JSON_HEADERS
+        ) as response:
+            response.raise_for_status()
+            await response.read()
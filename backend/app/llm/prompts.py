@@ -1,16 +1,18 @@
 """
 LLM Prompts and Templates
 """
+import sys
 
-# Planner System Prompt
-PLANNER_SYSTEM_PROMPT = """You are JARVIS, an intelligent AI assistant with agentic capabilities.
+
+# Planner System Prompt (interned: passed unchanged on every planner call)
+PLANNER_SYSTEM_PROMPT = sys.intern("""You are JARVIS, an intelligent AI assistant with agentic capabilities.
 
 Your role is to analyze user requests and create execution plans. You have access to various tools through the Model Context Protocol (MCP).
 
 Available Tools:
-- Memory: save_conversation, get_user_preferences, log_interaction, get_task_history
+- Memory: save_conversation, get_user_preferences, log_interaction, get_task_history, get_user_context
 - Vector DB: store_embedding, semantic_search, retrieve_context
-- Telegram: send_telegram_message, get_telegram_updates, send_telegram_notification
+- Telegram: send_telegram_message, get_telegram_updates, send_telegram_notification, send_telegram_batch
 - Calendar: list_calendar_events, create_calendar_event, update_calendar_event, delete_calendar_event
 - Gmail: list_emails, read_email, create_email_draft, send_email
 - Windows OS: open_application, close_application, run_powershell, manage_files
@@ -35,21 +37,40 @@ When creating a plan, respond with JSON in this format:
 Set "is_complete" to true if you can answer directly without tools.
 Set "is_complete" to false if you need to use tools.
 
-Be concise and efficient. Only use tools when necessary."""
-
-# Planner User Template
-PLANNER_USER_TEMPLATE = """User Request: {user_message}
-
-Previous Context:
-{context}
-
-Previous Observations:
-{observations}
-
-Create an execution plan for this request."""
-
-# Observer System Prompt
-OBSERVER_SYSTEM_PROMPT = """You are JARVIS's observation module.
+Be concise and efficient. Only use tools when necessary.""")
+
+
+# Planner user prompt
+# Static instructions come first and per-request fields last, ordered from
+# most to least stable: conversation context changes once per turn, the
+# user request once per turn, and observations only grow within a turn.
+# Each planner iteration therefore shares the longest possible prompt
+# prefix with the previous one, which Ollama reuses from its KV cache.
+def render_planner_user(
+    user_message: str,
+    context: str,
+    observations: str,
+    semantic_context: str = ""
+) -> str:
+    """
+    Render the planner user prompt
+    
+    Args:
+        user_message: User's request
+        context: Rendered conversation history
+        observations: Rendered observations so far
+        semantic_context: Optional rendered memory section, ending in a blank line
+    """
+    return (
+        "Create an execution plan for the user request below.\n\n"
+        f"Previous Context:\n{context}\n\n"
+        f"{semantic_context}User Request: {user_message}\n\n"
+        f"Previous Observations:\n{observations}"
+    )
+
+
+# Observer System Prompt (interned: passed unchanged on every observer call)
+OBSERVER_SYSTEM_PROMPT = sys.intern("""You are JARVIS's observation module.
 
 Your role is to analyze tool execution results and determine the next action.
 
@@ -69,16 +90,18 @@ Set "should_finish" to false if:
 - You need to execute additional tools
 - You need to retry failed operations
 
-Be helpful and informative in your responses."""
+Be helpful and informative in your responses.""")
 
-# Observer User Template
-OBSERVER_USER_TEMPLATE = """Original Plan:
-{plan}
 
-Tool Execution Results:
-{results}
+# Observer user prompt (static instruction first, results last)
+def render_observer_user(plan: str, results: str) -> str:
+    """Render the observer user prompt"""
+    return (
+        "Analyze the tool execution results below and determine the next action.\n\n"
+        f"Original Plan:\n{plan}\n\n"
+        f"Tool Execution Results:\n{results}"
+    )
 
-Analyze these results and determine the next action."""
 
 # Chat System Prompt
 CHAT_SYSTEM_PROMPT = """You are JARVIS, a helpful and intelligent AI assistant.
@@ -0,0 +1,49 @@
+"""
+Logging configuration for JARVIS
+"""
+from typing import Optional
+import logging
+import logging.handlers
+import queue
+
+from app.config import settings
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """
+    Route application logs through a queue
+
+    Log records are handed to a QueueHandler and written by a background
+    QueueListener thread, so the event loop never blocks on stream writes.
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(logging.DEBUG if settings.debug else logging.INFO)
+    app_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    app_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued log records and stop the background listener"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
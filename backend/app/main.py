@@ -3,30 +3,94 @@ FastAPI main application entry point
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import aiohttp
+import asyncio
+import logging
 
 from app.config import settings
+from app.logging_config import setup_logging, shutdown_logging
+from app.models.database import engine, init_db, warmup_db
+from app.llm.ollama_client import OllamaClient
+from app.mcp.client import MCPClient
+from app.agent.core import Agent
+from app.agent.enhanced_core import EnhancedAgent
 from app.api import chat, voice, websocket
 
 
+log = logging.getLogger(__name__)
+
+
+async def _warmup_db() -> None:
+    """Create missing tables and fill the connection pool (runs in a worker thread)"""
+    try:
+        await asyncio.to_thread(init_db)
+        await asyncio.to_thread(warmup_db)
+    except Exception as e:
+        log.warning("Database warmup failed: %s", e)
+
+
+async def _warmup_ollama(ollama: OllamaClient) -> None:
+    """Verify Ollama is reachable and load the model before the first request"""
+    if not await ollama.check_health():
+        log.warning("⚠️ Ollama is not reachable at %s", settings.ollama_base_url)
+        return
+    try:
+        await ollama.warmup()
+        log.info("✅ Ollama model %s loaded", settings.ollama_model)
+    except Exception as e:
+        log.warning("Ollama warmup failed: %s", e)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
-    print(f"🚀 Starting {settings.app_name} v{settings.app_version}")
-    print(f"📡 Ollama URL: {settings.ollama_base_url}")
-    print(f"🤖 Model: {settings.ollama_model}")
+    setup_logging()
+    log.info("🚀 Starting %s v%s", settings.app_name, settings.app_version)
+    log.info("📡 Ollama URL: %s", settings.ollama_base_url)
+    log.info("🤖 Model: %s", settings.ollama_model)
+    
+    # One pooled HTTP session to Ollama and the MCP servers, shared by every
+    # client and agent; the MCP client sets its own per-request timeout.
+    # Each host gets enough keep-alive connections for its concurrent calls
+    # so they do not queue behind one another on a single connection
+    app.state.http = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=settings.http_pool_size,
+            limit_per_host=settings.http_pool_size_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=settings.http_keepalive_timeout
+        ),
+        timeout=aiohttp.ClientTimeout(total=settings.ollama_timeout)
+    )
+    app.state.ollama = OllamaClient(
+        timeout=settings.ollama_timeout,
+        session=app.state.http
+    )
+    app.state.mcp = MCPClient(session=app.state.http)
+    app.state.agent = Agent(app.state.ollama, mcp_client=app.state.mcp)
+    app.state.enhanced_agent = EnhancedAgent(
+        app.state.ollama,
+        enable_semantic_memory=True,
+        mcp_client=app.state.mcp
+    )
     
-    # TODO: Initialize database connections
-    # TODO: Initialize MCP client
-    # TODO: Verify Ollama connection
+    # Warm the database pool and the Ollama model concurrently, so the first
+    # request does not pay for connecting and model loading
+    await asyncio.gather(_warmup_db(), _warmup_ollama(app.state.ollama))
     
     yield
     
     # Shutdown
-    print("👋 Shutting down JARVIS")
-    # TODO: Close database connections
-    # TODO: Close MCP connections
+    log.info("👋 Shutting down JARVIS")
+    await app.state.enhanced_agent.close()
+    await app.state.ollama.close()
+    await app.state.mcp.close()
+    await app.state.http.close()
+    engine.dispose()
+    shutdown_logging()
 
 
 # Create FastAPI app
@@ -34,7 +98,8 @@ app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="Multimodal Agentic AI Assistant",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -1,6 +1,6 @@
 """
 MCP module - Model Context Protocol integration
 """
-from app.mcp.client import MCPClient
+from app.mcp.client import MCPClient, MCPToolError
 
-__all__ = ["MCPClient"]
+__all__ = ["MCPClient", "MCPToolError"]
@@ -1,10 +1,22 @@
 """
 MCP Client - Communicates with MCP servers
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import asyncio
+import logging
 import aiohttp
 
 from app.config import settings
+from app.utils.cache_utils import HealthCache
+from app.utils.json_utils import JSON_HEADERS, dumpb, loads
+
+
+log = logging.getLogger(__name__)
+
+
+class MCPToolError(Exception):
+    """Tool call the MCP server answered with success=false"""
+    __slots__ = ()
 
 
 class MCPClient:
@@ -12,7 +24,20 @@ class MCPClient:
     Client for communicating with MCP servers
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        timeout: float = 30,
+        max_concurrency_per_server: Optional[int] = None
+    ):
+        """
+        Initialize MCP client
+        
+        Args:
+            session: Optional shared session; it is not closed by close()
+            timeout: Per-request timeout in seconds
+            max_concurrency_per_server: Maximum in-flight requests to each server
+        """
         self.server_urls = {
             "memory_db": settings.mcp_memory_db_url,
             "vector_db": settings.mcp_vector_db_url,
@@ -22,21 +47,39 @@ class MCPClient:
             "windows_os": settings.mcp_windows_os_url,
             "voice": settings.mcp_voice_url,
         }
-        self.session: Optional[aiohttp.ClientSession] = None
+        # Applied per request, since a shared session carries its own default
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
+        
+        # Shared by every caller of this client so no single MCP server is
+        # flooded, whichever agent or executor the requests come from
+        self.max_concurrency_per_server = (
+            max_concurrency_per_server or settings.tool_server_concurrency
+        )
+        self._server_sems: Dict[str, asyncio.Semaphore] = {}
+        self._health = HealthCache(settings.health_check_ttl)
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session"""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30)
-            )
+            self.session = aiohttp.ClientSession(timeout=self.timeout)
+            self._owns_session = True
         return self.session
     
     async def close(self):
-        """Close the session"""
-        if self.session and not self.session.closed:
+        """Close the session if this client created it"""
+        if self._owns_session and self.session and not self.session.closed:
             await self.session.close()
     
+    def _server_slot(self, server: str) -> asyncio.Semaphore:
+        """Concurrency limiter for one server"""
+        sem = self._server_sems.get(server)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_concurrency_per_server)
+            self._server_sems[server] = sem
+        return sem
+    
     async def call_tool(
         self,
         server: str,
@@ -53,6 +96,9 @@ class MCPClient:
             
         Returns:
             Tool execution result
+            
+        Raises:
+            MCPToolError: If the server reports the tool call as failed
         """
         if server not in self.server_urls:
             raise ValueError(f"Unknown MCP server: {server}")
@@ -66,21 +112,82 @@ class MCPClient:
         }
         
         try:
-            async with session.post(
+            async with self._server_slot(server), session.post(
                 f"{server_url}/execute",
-                json=payload
+                data=dumpb(payload),
+                headers=JSON_HEADERS,
+                timeout=self.timeout
+            ) as response:
+                response.raise_for_status()
+                data = loads(await response.read())
+        except aiohttp.ClientError as e:
+            log.error("MCP server error (%s): %s", server, e)
+            raise
+        except Exception as e:
+            log.exception("Unexpected error calling %s", server)
+            raise
+        
+        if not data.get("success", True):
+            raise MCPToolError(data.get("error") or f"Tool {tool} failed")
+        return data.get("result")
+    
+    async def call_tools_batch(
+        self,
+        server: str,
+        calls: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Call several tools on one MCP server in a single request
+        
+        Args:
+            server: Server name (e.g., 'memory_db', 'telegram')
+            calls: List of dicts with 'tool' and 'parameters'
+            
+        Returns:
+            Per-call responses with 'success', 'result' and 'error'
+        """
+        if server not in self.server_urls:
+            raise ValueError(f"Unknown MCP server: {server}")
+        
+        server_url = self.server_urls[server]
+        session = await self._get_session()
+        
+        try:
+            async with self._server_slot(server), session.post(
+                f"{server_url}/execute_batch",
+                data=dumpb({"calls": calls}),
+                headers=JSON_HEADERS,
+                timeout=self.timeout
             ) as response:
                 response.raise_for_status()
-                data = await response.json()
-                return data.get("result")
+                data = loads(await response.read())
+                return data.get("results", [])
                 
         except aiohttp.ClientError as e:
-            print(f"MCP server error ({server}): {e}")
+            log.error("MCP server error (%s): %s", server, e)
             raise
         except Exception as e:
-            print(f"Unexpected error calling {server}: {e}")
+            log.exception("Unexpected error calling %s", server)
             raise
     
+    async def call_tools_concurrent(
+        self,
+        calls: Sequence[Tuple[str, str, Dict[str, Any]]]
+    ) -> List[Any]:
+        """
+        Call several tools concurrently, one request each
+        
+        Args:
+            calls: (server, tool, parameters) tuples
+            
+        Returns:
+            Per-call results in order, with failures as exception instances
+        """
+        return await asyncio.gather(
+            *(self.call_tool(server, tool, parameters) for server, tool, parameters in calls),
+            return_exceptions=True
+        )
+    
     async def list_tools(self, server: str) -> list[Dict[str, Any]]:
         """
         List available tools on an MCP server
@@ -98,22 +205,25 @@ class MCPClient:
         session = await self._get_session()
         
         try:
-            async with session.get(f"{server_url}/tools") as response:
+            async with session.get(f"{server_url}/tools", timeout=self.timeout) as response:
                 response.raise_for_status()
-                data = await response.json()
+                data = loads(await response.read())
                 return data.get("tools", [])
                 
         except aiohttp.ClientError as e:
-            print(f"MCP server error ({server}): {e}")
+            log.warning("MCP server error (%s): %s", server, e)
             return []
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            log.exception("Unexpected error listing tools on %s", server)
             return []
     
     async def check_server_health(self, server: str) -> bool:
         """
         Check if an MCP server is healthy
         
+        Results are reused for settings.health_check_ttl seconds and
+        concurrent callers share one in-flight probe per server.
+        
         Args:
             server: Server name
             
@@ -123,11 +233,15 @@ class MCPClient:
         if server not in self.server_urls:
             return False
         
+        return await self._health.get(server, lambda: self._probe_server_health(server))
+    
+    async def _probe_server_health(self, server: str) -> bool:
+        """Query a server's /health once"""
         server_url = self.server_urls[server]
         session = await self._get_session()
         
         try:
-            async with session.get(f"{server_url}/health") as response:
+            async with session.get(f"{server_url}/health", timeout=self.timeout) as response:
                 return response.status == 200
         except Exception:
             return False
@@ -1,16 +1,27 @@
 """
 Long-term Memory - Persistent storage in relational database
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from contextlib import contextmanager
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.models.database import (
     Conversation, Message, UserPreference,
-    TaskHistory, InteractionLog, SessionLocal
+    TaskHistory, InteractionLog, SessionLocal,
+    bulk_insert_messages
 )
 
 
+# Single-row INSERTs built once; values are bound per call, so each execute
+# reuses SQLAlchemy's compiled form and the driver's cached statement
+_INSERT_CONVERSATION = insert(Conversation).returning(Conversation.id)
+_INSERT_MESSAGE = insert(Message).returning(Message.id)
+_INSERT_TASK = insert(TaskHistory).returning(TaskHistory.id)
+_INSERT_INTERACTION = insert(InteractionLog).returning(InteractionLog.id)
+
+
 class LongTermMemory:
     """
     Manages long-term memory using relational database
@@ -25,34 +36,57 @@ class LongTermMemory:
         """Get database session"""
         return SessionLocal()
     
+    @contextmanager
+    def _session(self, db: Optional[Session] = None, readonly: bool = False) -> Iterator[Session]:
+        """
+        Use the caller's session, or open one that is committed and closed here
+        
+        A caller-provided session (e.g. from the get_db dependency) is left
+        open and uncommitted, so several calls share one connection and one
+        transaction. Sessions opened for readonly use are closed without a
+        commit.
+        """
+        if db is not None:
+            yield db
+            return
+        
+        db = self._get_db()
+        try:
+            yield db
+            if not readonly:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
     # ==================== Conversation Management ====================
     
-    def create_conversation(self, user_id: str) -> int:
+    def create_conversation(self, user_id: str, db: Optional[Session] = None) -> int:
         """
         Create a new conversation
         
         Args:
             user_id: User identifier
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             Conversation ID
         """
-        db = self._get_db()
-        try:
-            conversation = Conversation(user_id=user_id)
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-            return conversation.id
-        finally:
-            db.close()
+        with self._session(db) as db:
+            conversation_id = db.execute(
+                _INSERT_CONVERSATION, {"user_id": user_id}
+            ).scalar_one()
+            return conversation_id
     
     def save_message(
         self,
         conversation_id: int,
         role: str,
         content: str,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        db: Optional[Session] = None
     ) -> int:
         """
         Save a message to database
@@ -62,29 +96,151 @@ class LongTermMemory:
             role: Message role
             content: Message content
             metadata: Optional metadata
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             Message ID
         """
-        db = self._get_db()
-        try:
-            message = Message(
-                conversation_id=conversation_id,
-                role=role,
-                content=content,
-                extra_data=metadata
-            )
-            db.add(message)
-            db.commit()
-            db.refresh(message)
-            return message.id
-        finally:
-            db.close()
+        with self._session(db) as db:
+            message_id = db.execute(
+                _INSERT_MESSAGE,
+                {
+                    "conversation_id": conversation_id,
+                    "role": role,
+                    "content": content,
+                    "extra_data": metadata
+                }
+            ).scalar_one()
+            return message_id
+    
+    def save_messages(
+        self,
+        conversation_id: int,
+        messages: List[Dict[str, Any]],
+        db: Optional[Session] = None
+    ) -> List[int]:
+        """
+        Save several messages in one INSERT and one commit
+        
+        Args:
+            conversation_id: Conversation ID
+            messages: Dicts with 'role', 'content' and optional 'metadata'
+            db: Optional session to reuse; the caller then owns commit and close
+            
+        Returns:
+            Message IDs, in order
+        """
+        if not messages:
+            return []
+        
+        with self._session(db) as db:
+            return bulk_insert_messages(db, [
+                {
+                    "conversation_id": conversation_id,
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "extra_data": msg.get("metadata")
+                }
+                for msg in messages
+            ])
+    
+    def save_conversation(
+        self,
+        user_id: str,
+        messages: List[Dict[str, Any]],
+        db: Optional[Session] = None
+    ) -> Tuple[int, List[int]]:
+        """
+        Create a conversation and save its messages in a single transaction
+        
+        Args:
+            user_id: User identifier
+            messages: Dicts with 'role', 'content' and optional 'metadata'
+            db: Optional session to reuse; the caller then owns commit and close
+            
+        Returns:
+            Tuple of (conversation ID, message IDs in order)
+        """
+        with self._session(db) as db:
+            conversation_id = self.create_conversation(user_id, db=db)
+            message_ids = self.save_messages(conversation_id, messages, db=db)
+            return conversation_id, message_ids
+    
+    def persist_turn(
+        self,
+        user_id: str,
+        conversation_id: Optional[int],
+        user_message: str,
+        assistant_message: str,
+        tool_calls: Optional[List[Dict[str, Any]]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        assistant_metadata: Optional[Dict[str, Any]] = None,
+        task_status: str = "completed",
+        db: Optional[Session] = None
+    ) -> int:
+        """
+        Save a full conversation turn in a single transaction
+        
+        Creates the conversation if needed, saves the user and assistant
+        messages, the task history (when tools were used) and a chat
+        interaction log, then commits once.
+        
+        Args:
+            user_id: User identifier
+            conversation_id: Existing conversation ID, or None to create one
+            user_message: User message content
+            assistant_message: Assistant message content
+            tool_calls: Optional tools used during the turn
+            metadata: Optional interaction log metadata
+            assistant_metadata: Optional assistant message metadata
+            task_status: Task status when tool_calls are given
+            db: Optional session to reuse; the caller then owns commit and close
+        
+        Returns:
+            Conversation ID
+        """
+        with self._session(db) as db:
+            if conversation_id is None:
+                conversation = Conversation(user_id=user_id)
+                db.add(conversation)
+                db.flush()
+                conversation_id = conversation.id
+            
+            db.add_all([
+                Message(
+                    conversation_id=conversation_id,
+                    role="user",
+                    content=user_message
+                ),
+                Message(
+                    conversation_id=conversation_id,
+                    role="assistant",
+                    content=assistant_message,
+                    extra_data=assistant_metadata
+                ),
+                InteractionLog(
+                    user_id=user_id,
+                    interaction_type="chat",
+                    extra_data=metadata
+                )
+            ])
+            
+            if tool_calls:
+                db.add(TaskHistory(
+                    conversation_id=conversation_id,
+                    task_description=user_message,
+                    tools_used=tool_calls,
+                    status=task_status,
+                    result={"response": assistant_message}
+                ))
+            
+            return conversation_id
     
     def get_conversation_messages(
         self,
         conversation_id: int,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        db: Optional[Session] = None
     ) -> List[Dict[str, Any]]:
         """
         Get messages from a conversation
@@ -92,12 +248,12 @@ class LongTermMemory:
         Args:
             conversation_id: Conversation ID
             limit: Optional limit on number of messages
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             List of messages
         """
-        db = self._get_db()
-        try:
+        with self._session(db, readonly=True) as db:
             query = db.query(Message).filter(
                 Message.conversation_id == conversation_id
             ).order_by(Message.created_at)
@@ -117,13 +273,12 @@ class LongTermMemory:
                 }
                 for msg in messages
             ]
-        finally:
-            db.close()
     
     def get_user_conversations(
         self,
         user_id: str,
-        limit: int = 10
+        limit: int = 10,
+        db: Optional[Session] = None
     ) -> List[Dict[str, Any]]:
         """
         Get user's recent conversations
@@ -131,15 +286,21 @@ class LongTermMemory:
         Args:
             user_id: User identifier
             limit: Number of conversations to return
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             List of conversations
         """
-        db = self._get_db()
-        try:
-            conversations = db.query(Conversation).filter(
+        with self._session(db, readonly=True) as db:
+            # Count messages in the same query instead of loading them
+            rows = db.query(
+                Conversation,
+                func.count(Message.id).label("message_count")
+            ).outerjoin(Message).filter(
                 Conversation.user_id == user_id
-            ).order_by(Conversation.updated_at.desc()).limit(limit).all()
+            ).group_by(Conversation.id).order_by(
+                Conversation.updated_at.desc()
+            ).limit(limit).all()
             
             return [
                 {
@@ -147,19 +308,18 @@ class LongTermMemory:
                     "user_id": conv.user_id,
                     "created_at": conv.created_at.isoformat() if conv.created_at else None,
                     "updated_at": conv.updated_at.isoformat() if conv.updated_at else None,
-                    "message_count": len(conv.messages)
+                    "message_count": message_count
                 }
-                for conv in conversations
+                for conv, message_count in rows
             ]
-        finally:
-            db.close()
     
     # ==================== User Preferences ====================
     
     def save_user_preferences(
         self,
         user_id: str,
-        preferences: Dict[str, Any]
+        preferences: Dict[str, Any],
+        db: Optional[Session] = None
     ) -> None:
         """
         Save or update user preferences
@@ -167,9 +327,9 @@ class LongTermMemory:
         Args:
             user_id: User identifier
             preferences: User preferences dictionary
+            db: Optional session to reuse; the caller then owns commit and close
         """
-        db = self._get_db()
-        try:
+        with self._session(db) as db:
             pref = db.query(UserPreference).filter(
                 UserPreference.user_id == user_id
             ).first()
@@ -183,29 +343,24 @@ class LongTermMemory:
                 )
                 db.add(pref)
             
-            db.commit()
-        finally:
-            db.close()
     
-    def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
+    def get_user_preferences(self, user_id: str, db: Optional[Session] = None) -> Dict[str, Any]:
         """
         Get user preferences
         
         Args:
             user_id: User identifier
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             User preferences dictionary
         """
-        db = self._get_db()
-        try:
+        with self._session(db, readonly=True) as db:
             pref = db.query(UserPreference).filter(
                 UserPreference.user_id == user_id
             ).first()
             
             return pref.preferences if pref and pref.preferences else {}
-        finally:
-            db.close()
     
     # ==================== Task History ====================
     
@@ -215,7 +370,8 @@ class LongTermMemory:
         task_description: str,
         tools_used: List[Dict[str, Any]],
         status: str,
-        result: Optional[Dict[str, Any]] = None
+        result: Optional[Dict[str, Any]] = None,
+        db: Optional[Session] = None
     ) -> int:
         """
         Save task execution history
@@ -226,30 +382,30 @@ class LongTermMemory:
             tools_used: List of tools that were used
             status: Task status (pending, completed, failed)
             result: Optional task result
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             Task ID
         """
-        db = self._get_db()
-        try:
-            task = TaskHistory(
-                conversation_id=conversation_id,
-                task_description=task_description,
-                tools_used=tools_used,
-                status=status,
-                result=result
-            )
-            db.add(task)
-            db.commit()
-            db.refresh(task)
-            return task.id
-        finally:
-            db.close()
+        with self._session(db) as db:
+            task_id = db.execute(
+                _INSERT_TASK,
+                {
+                    "conversation_id": conversation_id,
+                    "task_description": task_description,
+                    "tools_used": tools_used,
+                    "status": status,
+                    "result": result
+                }
+            ).scalar_one()
+            return task_id
     
     def get_task_history(
         self,
         conversation_id: Optional[int] = None,
-        limit: int = 10
+        limit: int = 10,
+        user_id: Optional[str] = None,
+        db: Optional[Session] = None
     ) -> List[Dict[str, Any]]:
         """
         Get task execution history
@@ -257,16 +413,21 @@ class LongTermMemory:
         Args:
             conversation_id: Optional conversation ID filter
             limit: Number of tasks to return
+            user_id: Optional filter on the user owning the conversation
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             List of tasks
         """
-        db = self._get_db()
-        try:
+        with self._session(db, readonly=True) as db:
             query = db.query(TaskHistory)
             
             if conversation_id:
                 query = query.filter(TaskHistory.conversation_id == conversation_id)
+            if user_id:
+                query = query.join(
+                    Conversation, TaskHistory.conversation_id == Conversation.id
+                ).filter(Conversation.user_id == user_id)
             
             tasks = query.order_by(TaskHistory.created_at.desc()).limit(limit).all()
             
@@ -282,8 +443,6 @@ class LongTermMemory:
                 }
                 for task in tasks
             ]
-        finally:
-            db.close()
     
     # ==================== Interaction Logs ====================
     
@@ -291,7 +450,8 @@ class LongTermMemory:
         self,
         user_id: str,
         interaction_type: str,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        db: Optional[Session] = None
     ) -> int:
         """
         Log user interaction
@@ -300,29 +460,28 @@ class LongTermMemory:
             user_id: User identifier
             interaction_type: Type of interaction (chat, voice, telegram)
             metadata: Optional metadata
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             Log ID
         """
-        db = self._get_db()
-        try:
-            log = InteractionLog(
-                user_id=user_id,
-                interaction_type=interaction_type,
-                extra_data=metadata
-            )
-            db.add(log)
-            db.commit()
-            db.refresh(log)
-            return log.id
-        finally:
-            db.close()
+        with self._session(db) as db:
+            log_id = db.execute(
+                _INSERT_INTERACTION,
+                {
+                    "user_id": user_id,
+                    "interaction_type": interaction_type,
+                    "extra_data": metadata
+                }
+            ).scalar_one()
+            return log_id
     
     def get_interaction_logs(
         self,
         user_id: str,
         interaction_type: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        db: Optional[Session] = None
     ) -> List[Dict[str, Any]]:
         """
         Get interaction logs
@@ -331,12 +490,12 @@ class LongTermMemory:
             user_id: User identifier
             interaction_type: Optional interaction type filter
             limit: Number of logs to return
+            db: Optional session to reuse; the caller then owns commit and close
             
         Returns:
             List of interaction logs
         """
-        db = self._get_db()
-        try:
+        with self._session(db, readonly=True) as db:
             query = db.query(InteractionLog).filter(
                 InteractionLog.user_id == user_id
             )
@@ -356,5 +515,3 @@ class LongTermMemory:
                 }
                 for log in logs
             ]
-        finally:
-            db.close()
@@ -1,15 +1,69 @@
 """
 Semantic Memory - RAG with ChromaDB and embeddings
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import repeat
+import asyncio
 import chromadb
 from chromadb.config import Settings
 import os
+import uuid
+
+import numpy as np
 
 from app.llm.ollama_client import OllamaClient
 from app.config import settings as app_settings
 
 
+# Normalized query embeddings kept per SemanticMemory instance
+QUERY_EMBEDDING_CACHE_SIZE = 512
+
+# Conversation embedding sums kept per SemanticMemory instance
+CONVERSATION_CENTROID_CACHE_SIZE = 256
+
+# IDs per delete call when clearing a collection
+CLEAR_BATCH_SIZE = 5000
+
+# Threads running blocking Chroma calls per SemanticMemory instance
+CHROMA_IO_WORKERS = 2
+
+# Texts per embedding request and collection write in add_memories
+EMBED_BATCH_SIZE = 64
+
+# Context text when nothing relevant was found
+NO_CONTEXT_TEXT = "No relevant context found."
+
+
+class ContextResult(NamedTuple):
+    """Retrieved RAG context"""
+    text: str  # Formatted context, or NO_CONTEXT_TEXT
+    chunks: List[str]  # Retrieved memory texts, most relevant first
+    has_context: bool
+
+
+def _normalize(embedding: List[float]) -> List[float]:
+    """L2-normalize an embedding so inner product equals cosine similarity"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    vector /= np.linalg.norm(vector) + 1e-12
+    return vector.tolist()
+
+
+def _collection_metadata() -> Dict[str, Any]:
+    """Collection metadata, including the HNSW index configuration"""
+    return {
+        "description": "JARVIS semantic memory",
+        "hnsw:space": app_settings.vector_db_hnsw_space,
+        "hnsw:M": app_settings.vector_db_hnsw_m,
+        "hnsw:construction_ef": app_settings.vector_db_hnsw_construction_ef,
+        "hnsw:search_ef": app_settings.vector_db_hnsw_search_ef,
+        "hnsw:batch_size": app_settings.vector_db_hnsw_batch_size,
+        "hnsw:sync_threshold": app_settings.vector_db_hnsw_sync_threshold,
+    }
+
+
 class SemanticMemory:
     """
     Manages semantic memory using ChromaDB for vector storage
@@ -19,7 +73,8 @@ class SemanticMemory:
     def __init__(
         self,
         collection_name: str = "jarvis_memory",
-        persist_directory: Optional[str] = None
+        persist_directory: Optional[str] = None,
+        llm_client: Optional[OllamaClient] = None
     ):
         """
         Initialize semantic memory
@@ -27,6 +82,7 @@ class SemanticMemory:
         Args:
             collection_name: Name of the ChromaDB collection
             persist_directory: Directory to persist vector database
+            llm_client: Optional Ollama client to share for embeddings
         """
         self.collection_name = collection_name
         self.persist_directory = persist_directory or app_settings.vector_db_path
@@ -40,14 +96,42 @@ class SemanticMemory:
             )
         )
         
-        # Get or create collection
+        # Get or create collection; an existing collection keeps the HNSW
+        # settings it was created with
         self.collection = self.client.get_or_create_collection(
             name=self.collection_name,
-            metadata={"description": "JARVIS semantic memory"}
+            metadata=_collection_metadata()
         )
         
         # Initialize Ollama client for embeddings
-        self.llm_client = OllamaClient()
+        self.llm_client = llm_client or OllamaClient()
+        self._owns_llm_client = llm_client is None
+        
+        # Recent query embeddings, already normalized, by exact query text
+        self._query_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        
+        # Recent conversations: sum of their unit embeddings and how many
+        # there are, seeded from the collection on first use
+        self._conv_centroids: "OrderedDict[str, Tuple[np.ndarray, int]]" = OrderedDict()
+        
+        # Chroma adds and queries update or walk the HNSW graph synchronously;
+        # running them here keeps the event loop free for embedding requests
+        self._io_pool = ThreadPoolExecutor(
+            max_workers=CHROMA_IO_WORKERS,
+            thread_name_prefix="chroma-io"
+        )
+    
+    async def close(self):
+        """Stop the Chroma I/O threads, and the Ollama client if it was created here"""
+        self._io_pool.shutdown(wait=False, cancel_futures=True)
+        if self._owns_llm_client:
+            await self.llm_client.close()
+    
+    async def _run_io(self, fn, /, **kwargs):
+        """Run a blocking Chroma call on the I/O pool"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._io_pool, partial(fn, **kwargs)
+        )
     
     async def add_memory(
         self,
@@ -66,27 +150,146 @@ class SemanticMemory:
         Returns:
             Memory ID
         """
-        # Generate embedding
-        embedding = await self.llm_client.embed(text)
+        memory_ids = await self.add_memories(
+            [text],
+            [metadata or {}],
+            [memory_id] if memory_id else None
+        )
+        return memory_ids[0]
+    
+    async def add_memories(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        memory_ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Add several memories with batched embedding requests and collection writes
         
-        # Generate ID if not provided
-        if not memory_id:
-            import uuid
-            memory_id = str(uuid.uuid4())
+        Texts go in batches of EMBED_BATCH_SIZE; each batch is embedded while
+        the previous one is written to the collection.
+        
+        Args:
+            texts: Text contents to store
+            metadatas: Metadata per text (updated in place with text_length)
+            memory_ids: Optional custom IDs, auto-generated if not provided
+            
+        Returns:
+            Memory IDs, in order
+        """
+        if not texts:
+            return []
+        
+        # Generate IDs if not provided
+        if not memory_ids:
+            memory_ids = [str(uuid.uuid4()) for _ in texts]
         
         # Prepare metadata
-        meta = metadata or {}
-        meta["text_length"] = len(text)
-        
-        # Add to collection
-        self.collection.add(
-            embeddings=[embedding],
-            documents=[text],
-            metadatas=[meta],
-            ids=[memory_id]
+        for text, meta in zip(texts, metadatas):
+            meta["text_length"] = len(text)
+        
+        embeddings: List[List[float]] = []
+        pending_add: Optional[asyncio.Future] = None
+        try:
+            for start in range(0, len(texts), EMBED_BATCH_SIZE):
+                batch = slice(start, start + EMBED_BATCH_SIZE)
+                
+                # Generate embeddings, unit length for the inner-product index
+                batch_embeddings = [
+                    _normalize(embedding)
+                    for embedding in await self.llm_client.embed_batch(texts[batch])
+                ]
+                embeddings.extend(batch_embeddings)
+                
+                if pending_add is not None:
+                    await pending_add
+                
+                # Add to collection off the event loop, overlapping the next embed
+                pending_add = asyncio.ensure_future(self._run_io(
+                    self.collection.add,
+                    embeddings=batch_embeddings,
+                    documents=texts[batch],
+                    metadatas=metadatas[batch],
+                    ids=memory_ids[batch]
+                ))
+        finally:
+            if pending_add is not None:
+                await pending_add
+        
+        self._update_centroids(embeddings, metadatas)
+        
+        return memory_ids
+    
+    def _update_centroids(
+        self,
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Fold new unit embeddings into their conversations' running sums
+        
+        Conversations not cached yet are left alone; they are seeded from the
+        collection, new memories included, on first use.
+        """
+        for embedding, meta in zip(embeddings, metadatas):
+            entry = self._conv_centroids.get(meta.get("conversation_id"))
+            if entry is None:
+                continue
+            
+            total, count = entry
+            self._conv_centroids[meta["conversation_id"]] = (
+                total + np.asarray(embedding, dtype=np.float32),
+                count + 1
+            )
+    
+    async def _conversation_centroid(
+        self,
+        conversation_id: str
+    ) -> Optional[Tuple[np.ndarray, int]]:
+        """Cached embedding sum and count for a conversation, loaded if missing"""
+        entry = self._conv_centroids.get(conversation_id)
+        if entry is not None:
+            self._conv_centroids.move_to_end(conversation_id)
+            return entry
+        
+        stored = await self._run_io(
+            self.collection.get,
+            where={"conversation_id": conversation_id},
+            include=["embeddings"]
         )
+        embeddings = stored["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            return None
         
-        return memory_id
+        # Stored embeddings are already unit length
+        entry = (np.asarray(embeddings, dtype=np.float32).sum(axis=0), len(embeddings))
+        self._conv_centroids[conversation_id] = entry
+        if len(self._conv_centroids) > CONVERSATION_CENTROID_CACHE_SIZE:
+            self._conv_centroids.popitem(last=False)
+        return entry
+    
+    async def conversation_relevance(self, query: str, conversation_id: str) -> Optional[float]:
+        """
+        Mean cosine similarity between a query and a conversation's memories
+        
+        The mean of cosines equals the dot product with the mean of the unit
+        embeddings, so this is one dot product and no collection query.
+        Callers can skip get_conversation_context when the score is low.
+        
+        Args:
+            query: Query text
+            conversation_id: Conversation identifier
+            
+        Returns:
+            Relevance in [-1, 1], or None if the conversation has no memories
+        """
+        entry = await self._conversation_centroid(conversation_id)
+        if entry is None:
+            return None
+        
+        total, count = entry
+        query_embedding = np.asarray(await self._embed_query(query), dtype=np.float32)
+        return float(np.dot(query_embedding, total)) / count
     
     async def search(
         self,
@@ -105,36 +308,50 @@ class SemanticMemory:
         Returns:
             List of relevant memories with scores
         """
-        # Generate query embedding
-        query_embedding = await self.llm_client.embed(query)
+        # Generate query embedding, normalized like the stored ones
+        query_embedding = await self._embed_query(query)
         
-        # Search in collection
-        results = self.collection.query(
+        # Search in collection, off the event loop
+        results = await self._run_io(
+            self.collection.query,
             query_embeddings=[query_embedding],
             n_results=limit,
             where=filter_metadata
         )
         
         # Format results
-        memories = []
-        if results and results["documents"]:
-            for i, doc in enumerate(results["documents"][0]):
-                memory = {
-                    "id": results["ids"][0][i],
-                    "text": doc,
-                    "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                    "distance": results["distances"][0][i] if results["distances"] else None
-                }
-                memories.append(memory)
-        
-        return memories
+        if not results or not results["documents"]:
+            return []
+        
+        docs = results["documents"][0]
+        ids = results["ids"][0]
+        metas = results["metadatas"][0] if results["metadatas"] else [{} for _ in docs]
+        dists = results["distances"][0] if results["distances"] else repeat(None)
+        
+        return [
+            {"id": memory_id, "text": doc, "metadata": meta, "distance": dist}
+            for memory_id, doc, meta, dist in zip(ids, docs, metas, dists)
+        ]
+    
+    async def _embed_query(self, query: str) -> List[float]:
+        """Normalized query embedding, reused for repeated queries"""
+        embedding = self._query_embeddings.get(query)
+        if embedding is not None:
+            self._query_embeddings.move_to_end(query)
+            return embedding
+        
+        embedding = _normalize(await self.llm_client.embed(query))
+        self._query_embeddings[query] = embedding
+        if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+            self._query_embeddings.popitem(last=False)
+        return embedding
     
     async def retrieve_context(
         self,
         query: str,
         limit: int = 3,
         filter_metadata: Optional[Dict[str, Any]] = None
-    ) -> str:
+    ) -> ContextResult:
         """
         Retrieve relevant context for RAG
         
@@ -144,19 +361,18 @@ class SemanticMemory:
             filter_metadata: Optional metadata filters
             
         Returns:
-            Formatted context string
+            Formatted context with the retrieved chunks and whether any were found
         """
         memories = await self.search(query, limit, filter_metadata)
         
         if not memories:
-            return "No relevant context found."
+            return ContextResult(NO_CONTEXT_TEXT, [], False)
         
         # Format context
-        context_parts = []
-        for i, memory in enumerate(memories, 1):
-            context_parts.append(f"[Context {i}]\n{memory['text']}")
+        chunks = [memory["text"] for memory in memories]
+        text = "\n\n".join(f"[Context {i}]\n{chunk}" for i, chunk in enumerate(chunks, 1))
         
-        return "\n\n".join(context_parts)
+        return ContextResult(text, chunks, True)
     
     def delete_memory(self, memory_id: str) -> None:
         """
@@ -165,7 +381,13 @@ class SemanticMemory:
         Args:
             memory_id: Memory ID to delete
         """
+        metadatas = self.collection.get(ids=[memory_id], include=["metadatas"])["metadatas"]
         self.collection.delete(ids=[memory_id])
+        
+        # Drop the cached sum; it is reloaded without this memory on next use
+        for meta in metadatas or []:
+            if meta and "conversation_id" in meta:
+                self._conv_centroids.pop(meta["conversation_id"], None)
     
     def delete_by_metadata(self, filter_metadata: Dict[str, Any]) -> None:
         """
@@ -175,6 +397,8 @@ class SemanticMemory:
             filter_metadata: Metadata filter
         """
         self.collection.delete(where=filter_metadata)
+        if set(filter_metadata) == {"conversation_id"}:
+            self._conv_centroids.pop(filter_metadata["conversation_id"], None)
     
     def get_memory_count(self) -> int:
         """
@@ -188,13 +412,29 @@ class SemanticMemory:
     def clear_all(self) -> None:
         """
         Clear all memories (use with caution!)
+        
+        Rows are deleted in batches and the collection and its index are
+        kept; use hard_reset() to rebuild them with new HNSW settings.
+        """
+        all_ids = self.collection.get(include=[])["ids"]
+        for start in range(0, len(all_ids), CLEAR_BATCH_SIZE):
+            self.collection.delete(ids=all_ids[start:start + CLEAR_BATCH_SIZE])
+        self._conv_centroids.clear()
+    
+    def hard_reset(self) -> None:
+        """
+        Drop and recreate the collection (use with caution!)
+        
+        The new collection uses the current HNSW settings, which is how a
+        changed distance space takes effect.
         """
         # Delete and recreate collection
         self.client.delete_collection(name=self.collection_name)
         self.collection = self.client.create_collection(
             name=self.collection_name,
-            metadata={"description": "JARVIS semantic memory"}
+            metadata=_collection_metadata()
         )
+        self._conv_centroids.clear()
     
     async def add_conversation_to_memory(
         self,
@@ -213,13 +453,12 @@ class SemanticMemory:
         Returns:
             List of memory IDs
         """
-        memory_ids = []
+        # Create searchable texts
+        texts = [f"{message['role']}: {message['content']}" for message in messages]
         
+        # Metadata
+        metadatas = []
         for i, message in enumerate(messages):
-            # Create searchable text
-            text = f"{message['role']}: {message['content']}"
-            
-            # Metadata
             metadata = {
                 "conversation_id": conversation_id,
                 "message_index": i,
@@ -229,18 +468,17 @@ class SemanticMemory:
             if user_id:
                 metadata["user_id"] = user_id
             
-            # Add to memory
-            memory_id = await self.add_memory(text, metadata)
-            memory_ids.append(memory_id)
+            metadatas.append(metadata)
         
-        return memory_ids
+        # Embed and store the whole conversation at once
+        return await self.add_memories(texts, metadatas)
     
     async def get_conversation_context(
         self,
         conversation_id: str,
         query: str,
         limit: int = 3
-    ) -> str:
+    ) -> ContextResult:
         """
         Get relevant context from a specific conversation
         
@@ -250,7 +488,7 @@ class SemanticMemory:
             limit: Maximum number of results
             
         Returns:
-            Formatted context string
+            Formatted context with the retrieved chunks and whether any were found
         """
         filter_metadata = {"conversation_id": conversation_id}
         return await self.retrieve_context(query, limit, filter_metadata)
@@ -1,8 +1,9 @@
 """
 Short-term Memory - Conversation context management
 """
-from typing import List, Dict, Any, Optional
-from collections import deque
+from typing import List, Dict, Any, Optional, Hashable, Tuple
+from collections import Counter, OrderedDict, deque
+from itertools import islice
 
 
 class ShortTermMemory:
@@ -11,19 +12,26 @@ class ShortTermMemory:
     Uses in-memory storage with configurable window size
     """
     
-    def __init__(self, max_messages: int = 10):
+    def __init__(self, max_messages: int = 10, max_conversations: int = 1000):
         """
         Initialize short-term memory
         
         Args:
             max_messages: Maximum number of messages to keep in context
+            max_conversations: Maximum number of conversations kept; the least
+                recently used one is dropped beyond this
         """
         self.max_messages = max_messages
-        self.conversations: Dict[str, deque] = {}
+        self.max_conversations = max_conversations
+        self.conversations: "OrderedDict[Hashable, deque]" = OrderedDict()
+        
+        # Last format_for_llm result per conversation, with its max_messages;
+        # dropped whenever the conversation changes
+        self._llm_cache: Dict[Hashable, Tuple[Optional[int], List[Dict[str, str]]]] = {}
     
     def add_message(
         self,
-        conversation_id: str,
+        conversation_id: Hashable,
         role: str,
         content: str,
         metadata: Optional[Dict[str, Any]] = None
@@ -32,13 +40,21 @@ class ShortTermMemory:
         Add a message to conversation context
         
         Args:
-            conversation_id: Unique conversation identifier
+            conversation_id: Unique conversation identifier (e.g. a UUID)
             role: Message role (user, assistant, system)
             content: Message content
             metadata: Optional metadata
         """
-        if conversation_id not in self.conversations:
-            self.conversations[conversation_id] = deque(maxlen=self.max_messages)
+        messages = self.conversations.get(conversation_id)
+        if messages is None:
+            messages = deque(maxlen=self.max_messages)
+            self.conversations[conversation_id] = messages
+            if len(self.conversations) > self.max_conversations:
+                evicted, _ = self.conversations.popitem(last=False)
+                self._llm_cache.pop(evicted, None)
+        else:
+            self.conversations.move_to_end(conversation_id)
+        self._llm_cache.pop(conversation_id, None)
         
         message = {
             "role": role,
@@ -46,53 +62,55 @@ class ShortTermMemory:
             "metadata": metadata or {}
         }
         
-        self.conversations[conversation_id].append(message)
+        messages.append(message)
     
     def get_context(
         self,
-        conversation_id: str,
+        conversation_id: Hashable,
         max_messages: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Get conversation context
         
         Args:
-            conversation_id: Unique conversation identifier
+            conversation_id: Unique conversation identifier (e.g. a UUID)
             max_messages: Optional limit on number of messages to return
             
         Returns:
             List of messages in chronological order
         """
-        if conversation_id not in self.conversations:
+        messages = self.conversations.get(conversation_id)
+        if not messages:
             return []
+        self.conversations.move_to_end(conversation_id)
         
-        messages = list(self.conversations[conversation_id])
+        if max_messages and max_messages < len(messages):
+            # Only copy the tail of the window
+            return list(islice(messages, len(messages) - max_messages, None))
         
-        if max_messages:
-            messages = messages[-max_messages:]
-        
-        return messages
+        return list(messages)
     
-    def clear_context(self, conversation_id: str) -> None:
+    def clear_context(self, conversation_id: Hashable) -> None:
         """
         Clear conversation context
         
         Args:
-            conversation_id: Unique conversation identifier
+            conversation_id: Unique conversation identifier (e.g. a UUID)
         """
         if conversation_id in self.conversations:
             del self.conversations[conversation_id]
+        self._llm_cache.pop(conversation_id, None)
     
     def get_last_message(
         self,
-        conversation_id: str,
+        conversation_id: Hashable,
         role: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Get the last message in conversation
         
         Args:
-            conversation_id: Unique conversation identifier
+            conversation_id: Unique conversation identifier (e.g. a UUID)
             role: Optional role filter
             
         Returns:
@@ -112,12 +130,12 @@ class ShortTermMemory:
         
         return messages[-1]
     
-    def get_conversation_summary(self, conversation_id: str) -> Dict[str, Any]:
+    def get_conversation_summary(self, conversation_id: Hashable) -> Dict[str, Any]:
         """
         Get conversation summary statistics
         
         Args:
-            conversation_id: Unique conversation identifier
+            conversation_id: Unique conversation identifier (e.g. a UUID)
             
         Returns:
             Summary statistics
@@ -132,37 +150,44 @@ class ShortTermMemory:
                 "system_messages": 0
             }
         
-        role_counts = {}
-        for message in messages:
-            role = message["role"]
-            role_counts[role] = role_counts.get(role, 0) + 1
+        role_counts = Counter(message["role"] for message in messages)
         
         return {
             "message_count": len(messages),
-            "user_messages": role_counts.get("user", 0),
-            "assistant_messages": role_counts.get("assistant", 0),
-            "system_messages": role_counts.get("system", 0),
-            "roles": role_counts
+            "user_messages": role_counts["user"],
+            "assistant_messages": role_counts["assistant"],
+            "system_messages": role_counts["system"],
+            "roles": dict(role_counts)
         }
     
     def format_for_llm(
         self,
-        conversation_id: str,
+        conversation_id: Hashable,
         max_messages: Optional[int] = None
     ) -> List[Dict[str, str]]:
         """
         Format conversation context for LLM input
         
         Args:
-            conversation_id: Unique conversation identifier
+            conversation_id: Unique conversation identifier (e.g. a UUID)
             max_messages: Optional limit on messages
             
         Returns:
-            List of messages formatted for LLM (role + content only)
+            List of messages formatted for LLM (role + content only); the
+            list is reused until the conversation changes, so treat it as
+            read-only
         """
+        cached = self._llm_cache.get(conversation_id)
+        if cached is not None and cached[0] == max_messages:
+            self.conversations.move_to_end(conversation_id)
+            return cached[1]
+        
         messages = self.get_context(conversation_id, max_messages)
         
-        return [
+        formatted = [
             {"role": msg["role"], "content": msg["content"]}
             for msg in messages
         ]
+        if messages:
+            self._llm_cache[conversation_id] = (max_messages, formatted)
+        return formatted
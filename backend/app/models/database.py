@@ -1,11 +1,18 @@
 """
 Database models using SQLAlchemy
 """
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, func
-from sqlalchemy.orm import sessionmaker, relationship, DeclarativeBase
+from sqlalchemy import event, create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Index, func, insert, text
+from sqlalchemy.orm import Session, sessionmaker, relationship, DeclarativeBase
+from typing import Any, Dict, List
 from sqlalchemy.types import JSON as JSONType
+import logging
 import os
 
+from app.utils.json_utils import dumps, loads
+
+
+log = logging.getLogger(__name__)
+
 
 class Base(DeclarativeBase):
     """Base class for all models"""
@@ -18,9 +25,27 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./jarvis.db")
 # Create engine
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    # JSON columns (extra_data, tools_used, result, preferences) go through orjson
+    json_serializer=dumps,
+    json_deserializer=loads
 )
 
+if "sqlite" in DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _connection_record):
+        """Tune every new SQLite connection for a write-heavy workload"""
+        cursor = dbapi_conn.cursor()
+        # WAL turns per-commit fsyncs into appends and lets readers run
+        # alongside a writer; NORMAL sync is durable across app crashes
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cursor.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        cursor.close()
+
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -28,6 +53,10 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 class Conversation(Base):
     """Conversation model"""
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Recent conversations per user
+        Index("ix_conv_user_updated", "user_id", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, nullable=False, index=True)
@@ -42,6 +71,10 @@ class Conversation(Base):
 class Message(Base):
     """Message model"""
     __tablename__ = "messages"
+    __table_args__ = (
+        # Messages of a conversation in order
+        Index("ix_msg_conv_created", "conversation_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
@@ -68,6 +101,10 @@ class UserPreference(Base):
 class TaskHistory(Base):
     """Task history model"""
     __tablename__ = "task_history"
+    __table_args__ = (
+        # Recent tasks per conversation
+        Index("ix_task_conv_created", "conversation_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
@@ -84,6 +121,12 @@ class TaskHistory(Base):
 class InteractionLog(Base):
     """Interaction log model"""
     __tablename__ = "interaction_logs"
+    __table_args__ = (
+        # Recent logs per user, filtered by type
+        Index("ix_log_user_type_created", "user_id", "interaction_type", "created_at"),
+        # Recent logs per user across all types, without a sort step
+        Index("ix_log_user_created", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, nullable=False, index=True)
@@ -92,16 +135,57 @@ class InteractionLog(Base):
     created_at = Column(DateTime, server_default=func.now())
 
 
+def bulk_insert_messages(db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert messages with one executemany INSERT
+    
+    Args:
+        db: Session to run in; the caller commits
+        rows: Dicts keyed by Message column names
+        
+    Returns:
+        New message IDs, in the order of rows
+    """
+    if not rows:
+        return []
+    return list(db.scalars(
+        insert(Message).returning(Message.id, sort_by_parameter_order=True),
+        rows
+    ))
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created")
+    
+    # create_all skips indexes of tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    log.info("✅ Database tables created")
+
+
+def warmup_db():
+    """Open a pooled connection and run a trivial query so the first request skips connect"""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
 
 
 def get_db():
-    """Get database session"""
+    """
+    Request-scoped database session from the engine's connection pool
+    
+    Pass it to LongTermMemory methods via their db argument; everything the
+    request writes is committed once when the request finishes, and rolled
+    back if it fails.
+    """
     db = SessionLocal()
     try:
         yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
@@ -0,0 +1,40 @@
+"""
+Async utilities - Deadlines for async iterators
+"""
+from typing import AsyncIterator, Optional, TypeVar
+import asyncio
+
+
+T = TypeVar("T")
+
+
+async def iter_with_deadline(
+    iterator: AsyncIterator[T],
+    timeout: Optional[float]
+) -> AsyncIterator[T]:
+    """
+    Re-yield items of an async iterator until a total deadline passes
+    
+    The deadline is only enforced while waiting for the next item, so the
+    cancellation never lands in the consumer's code between items.
+    
+    Args:
+        iterator: Source iterator, closed when this one finishes
+        timeout: Seconds for the whole iteration; None waits forever
+        
+    Raises:
+        TimeoutError: If the source is still producing when the deadline passes
+    """
+    deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+    try:
+        while True:
+            async with asyncio.timeout_at(deadline):
+                try:
+                    item = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -1,10 +1,45 @@
 """
 Audio processing utilities
 """
+import logging
 import os
+import subprocess
+import tempfile
+import wave
 from typing import Optional, Tuple
 from pathlib import Path
 
+# Optional audio backends, imported once so calls don't pay the import cost;
+# numpy is a dependency of soundfile
+try:
+    import numpy as _np
+    import soundfile as _sf
+except ImportError:
+    _np = _sf = None
+
+try:
+    import soxr as _soxr
+except ImportError:
+    _soxr = None
+
+try:
+    from pydub import AudioSegment as _AudioSegment
+    from pydub.effects import normalize as _pydub_normalize
+except ImportError:
+    _AudioSegment = _pydub_normalize = None
+
+
+log = logging.getLogger(__name__)
+
+# Audio file extensions accepted by validate_audio_file
+_VALID_AUDIO_EXTS = frozenset({".wav", ".mp3", ".ogg", ".flac", ".m4a", ".webm"})
+
+# Frames per block when streaming audio through soundfile
+NORMALIZE_BLOCK_SIZE = 65536
+
+# Peak level after normalization (about -0.1 dBFS, like pydub's default)
+NORMALIZE_TARGET_PEAK = 0.99
+
 
 def validate_audio_file(file_path: str) -> Tuple[bool, Optional[str]]:
     """
@@ -16,20 +51,20 @@ def validate_audio_file(file_path: str) -> Tuple[bool, Optional[str]]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    # Check if file exists
-    if not os.path.exists(file_path):
+    # Check if file exists; one stat call also provides the size
+    try:
+        file_size = os.stat(file_path).st_size
+    except FileNotFoundError:
         return False, f"File not found: {file_path}"
     
     # Check file extension
-    valid_extensions = ['.wav', '.mp3', '.ogg', '.flac', '.m4a', '.webm']
     ext = Path(file_path).suffix.lower()
     
-    if ext not in valid_extensions:
-        return False, f"Unsupported audio format: {ext}. Supported: {', '.join(valid_extensions)}"
+    if ext not in _VALID_AUDIO_EXTS:
+        return False, f"Unsupported audio format: {ext}. Supported: {', '.join(sorted(_VALID_AUDIO_EXTS))}"
     
     # Check file size (max 100MB)
     max_size = 100 * 1024 * 1024  # 100MB
-    file_size = os.path.getsize(file_path)
     
     if file_size > max_size:
         return False, f"File too large: {file_size / 1024 / 1024:.2f}MB (max 100MB)"
@@ -50,12 +85,25 @@ def get_audio_duration(file_path: str) -> Optional[float]:
     Returns:
         Duration in seconds or None if error
     """
+    if Path(file_path).suffix.lower() == ".wav":
+        # PCM WAV duration is in the RIFF header; no need to load libsndfile
+        try:
+            with wave.open(file_path, "rb") as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError, ZeroDivisionError):
+            pass  # Compressed or unusual WAV; let soundfile handle it
+        except OSError as e:
+            log.warning("Error getting audio duration: %s", e)
+            return None
+    
+    if _sf is None:
+        log.warning("Error getting audio duration: soundfile is not installed")
+        return None
+    
     try:
-        import soundfile as sf
-        info = sf.info(file_path)
-        return info.duration
+        return _sf.info(file_path).duration
     except Exception as e:
-        print(f"Error getting audio duration: {e}")
+        log.warning("Error getting audio duration: %s", e)
         return None
 
 
@@ -78,10 +126,15 @@ def convert_audio_format(
         Tuple of (success, error_message)
     """
     try:
-        from pydub import AudioSegment
+        if target_format == "wav" and Path(input_path).suffix.lower() == ".wav":
+            if _resample_wav(input_path, output_path, sample_rate):
+                return True, None
+        
+        if _AudioSegment is None:
+            return False, "pydub is required to convert audio"
         
         # Load audio
-        audio = AudioSegment.from_file(input_path)
+        audio = _AudioSegment.from_file(input_path)
         
         # Resample if needed
         if audio.frame_rate != sample_rate:
@@ -96,6 +149,28 @@ def convert_audio_format(
         return False, str(e)
 
 
+def _resample_wav(input_path: str, output_path: str, sample_rate: int) -> bool:
+    """
+    WAV-to-WAV conversion with soundfile and soxr, without an ffmpeg process
+    
+    Returns:
+        False if soundfile or soxr is not installed or libsndfile can't read the file
+    """
+    if _sf is None or _soxr is None:
+        return False
+    
+    try:
+        data, source_rate = _sf.read(input_path, dtype="float32", always_2d=False)
+    except _sf.LibsndfileError:
+        return False
+    
+    if source_rate != sample_rate:
+        data = _soxr.resample(data, source_rate, sample_rate, quality="HQ")
+    
+    _sf.write(output_path, data, sample_rate, subtype="PCM_16")
+    return True
+
+
 def normalize_audio(input_path: str, output_path: str) -> Tuple[bool, Optional[str]]:
     """
     Normalize audio volume
@@ -108,12 +183,15 @@ def normalize_audio(input_path: str, output_path: str) -> Tuple[bool, Optional[s
         Tuple of (success, error_message)
     """
     try:
-        from pydub import AudioSegment
-        from pydub.effects import normalize
+        if _sf is not None and _normalize_wav(input_path, output_path):
+            return True, None
+        
+        if _AudioSegment is None:
+            return False, "soundfile could not read the file and pydub is not installed"
         
         # Load and normalize
-        audio = AudioSegment.from_file(input_path)
-        normalized = normalize(audio)
+        audio = _AudioSegment.from_file(input_path)
+        normalized = _pydub_normalize(audio)
         
         # Export
         normalized.export(output_path, format="wav")
@@ -124,6 +202,38 @@ def normalize_audio(input_path: str, output_path: str) -> Tuple[bool, Optional[s
         return False, str(e)
 
 
+def _normalize_wav(input_path: str, output_path: str) -> bool:
+    """
+    Peak-normalize to PCM WAV in two streaming passes over float32 blocks
+    
+    Returns:
+        False if libsndfile can't read the file (e.g. m4a/webm)
+    """
+    try:
+        # Find the peak, then scale
+        peak = 0.0
+        for block in _sf.blocks(input_path, blocksize=NORMALIZE_BLOCK_SIZE, dtype="float32"):
+            if block.size:
+                peak = max(peak, float(_np.abs(block).max()))
+        gain = NORMALIZE_TARGET_PEAK / peak if peak > 0 else 1.0
+        
+        with _sf.SoundFile(input_path) as source, _sf.SoundFile(
+            output_path,
+            "w",
+            samplerate=source.samplerate,
+            channels=source.channels,
+            format="WAV",
+            subtype="PCM_16"
+        ) as target:
+            for block in source.blocks(blocksize=NORMALIZE_BLOCK_SIZE, dtype="float32"):
+                block *= gain
+                target.write(block)
+        
+        return True
+    except _sf.LibsndfileError:
+        return False
+
+
 def split_audio_chunks(
     file_path: str,
     chunk_duration: int = 30,
@@ -141,31 +251,45 @@ def split_audio_chunks(
         List of chunk file paths
     """
     try:
-        from pydub import AudioSegment
-        
         if output_dir is None:
             output_dir = os.path.dirname(file_path)
         
-        # Load audio
-        audio = AudioSegment.from_file(file_path)
+        # One ffmpeg pass writes every chunk; PCM WAV input is stream-copied,
+        # anything else is decoded once straight to PCM
+        codec = "copy" if Path(file_path).suffix.lower() == ".wav" else "pcm_s16le"
         
-        # Calculate chunks
-        chunk_length_ms = chunk_duration * 1000
-        chunks = []
+        # ffmpeg expands % in the output pattern, so literal ones are doubled
+        prefix = os.path.join(output_dir, Path(file_path).stem).replace("%", "%%")
         
-        for i, start_ms in enumerate(range(0, len(audio), chunk_length_ms)):
-            chunk = audio[start_ms:start_ms + chunk_length_ms]
-            
-            # Export chunk
-            chunk_path = os.path.join(
-                output_dir,
-                f"{Path(file_path).stem}_chunk_{i}.wav"
+        # ffmpeg writes the list to a temporary name and renames it into
+        # place, so it is read by path only after ffmpeg has exited
+        with tempfile.TemporaryDirectory() as list_dir:
+            segment_list = os.path.join(list_dir, "segments.txt")
+            subprocess.run(
+                [
+                    "ffmpeg", "-y", "-loglevel", "error",
+                    "-i", file_path,
+                    "-vn",
+                    "-f", "segment",
+                    "-segment_time", str(chunk_duration),
+                    "-reset_timestamps", "1",
+                    "-segment_list", segment_list,
+                    "-segment_list_type", "flat",
+                    "-c:a", codec,
+                    f"{prefix}_chunk_%d.wav"
+                ],
+                check=True,
+                capture_output=True
             )
-            chunk.export(chunk_path, format="wav")
-            chunks.append(chunk_path)
-        
-        return chunks
+            
+            # Chunk names as written by ffmpeg, in order
+            with open(segment_list, encoding="utf-8") as names:
+                return [
+                    os.path.join(output_dir, name)
+                    for name in names.read().splitlines()
+                    if name
+                ]
         
     except Exception as e:
-        print(f"Error splitting audio: {e}")
+        log.exception("Error splitting audio: %s", e)
         return []
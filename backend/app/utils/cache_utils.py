@@ -0,0 +1,127 @@
+"""
+Cache utilities - Short-lived memos for health probes and read-mostly lookups
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from collections import OrderedDict
+import asyncio
+import time
+
+
+class TTLCache:
+    """
+    Bounded LRU mapping whose entries expire after ttl seconds
+    
+    Meant for read-mostly lookups; writers pop() the keys they change.
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        """
+        Initialize TTL cache
+        
+        Args:
+            maxsize: Maximum number of entries; the least recently used goes first
+            ttl: Seconds an entry is reused
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return a fresh cached value
+        
+        Args:
+            key: Cache key
+            default: Returned when the key is missing or expired
+            
+        Returns:
+            Cached value or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            return default
+        
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> None:
+        """
+        Invalidate a key
+        
+        Args:
+            key: Cache key
+        """
+        self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Invalidate every key"""
+        self._entries.clear()
+
+
+class HealthCache:
+    """
+    TTL memo with single-flight coalescing for health probes
+    
+    A result is reused for ttl seconds, and concurrent callers for the same
+    key await the probe already in flight instead of starting another one.
+    """
+    
+    def __init__(self, ttl: float = 5.0):
+        """
+        Initialize health cache
+        
+        Args:
+            ttl: Seconds a probe result is reused; 0 disables caching
+        """
+        self.ttl = ttl
+        self._results: Dict[str, Tuple[float, bool]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    async def get(self, key: str, probe: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Return the cached health for a key, probing at most once at a time
+        
+        Args:
+            key: Probed target (e.g. a server name)
+            probe: Coroutine factory performing the actual check
+            
+        Returns:
+            True if healthy, False otherwise
+        """
+        cached = self._results.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        
+        future = self._inflight.get(key)
+        if future is not None:
+            # Shielded so a cancelled waiter does not cancel the shared probe
+            return await asyncio.shield(future)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        healthy = False
+        try:
+            healthy = await probe()
+            self._results[key] = (time.monotonic(), healthy)
+        finally:
+            # Waiters of an interrupted probe see it as unhealthy
+            del self._inflight[key]
+            future.set_result(healthy)
+        return healthy
@@ -0,0 +1,129 @@
+"""
+JSON serialization utilities
+
+Uses orjson when it is installed and falls back to the standard library.
+"""
+from typing import Any, Dict
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+# ```json fenced block, as emitted by most chat models
+_FENCED_JSON = re.compile(r"```json\s*(.*?)```", re.DOTALL)
+
+_DECODER = json.JSONDecoder()
+
+
+if orjson is not None:
+    def dumps(obj: Any, sort_keys: bool = False) -> str:
+        """
+        Serialize an object to a JSON string
+
+        Args:
+            obj: Object to serialize
+            sort_keys: Whether to sort dict keys (for stable hashing)
+
+        Returns:
+            JSON string
+        """
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+
+    def dumpb(obj: Any) -> bytes:
+        """
+        Serialize an object to UTF-8 JSON bytes, e.g. for a request body
+
+        Args:
+            obj: Object to serialize
+
+        Returns:
+            JSON bytes
+        """
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any, sort_keys: bool = False) -> str:
+        """
+        Serialize an object to a JSON string
+
+        Args:
+            obj: Object to serialize
+            sort_keys: Whether to sort dict keys (for stable hashing)
+
+        Returns:
+            JSON string
+        """
+        return json.dumps(obj, sort_keys=sort_keys)
+
+    def dumpb(obj: Any) -> bytes:
+        """
+        Serialize an object to UTF-8 JSON bytes, e.g. for a request body
+
+        Args:
+            obj: Object to serialize
+
+        Returns:
+            JSON bytes
+        """
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+# Headers for requests whose body comes from dumpb
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def extract_json(response: str) -> Dict[str, Any]:
+    """
+    Extract the first JSON object from an LLM response
+
+    A response that is a bare object is decoded directly, then a ```json
+    fenced block is tried; otherwise the response is scanned for the first
+    position where a complete object decodes, so surrounding prose and
+    braces in trailing text are tolerated.
+
+    Args:
+        response: Raw LLM response
+
+    Returns:
+        Decoded JSON object
+
+    Raises:
+        ValueError: If no JSON object is found
+    """
+    # Fast path: the whole response is a bare object, parsed in one C-level call
+    stripped = response.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        try:
+            data = loads(stripped)
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+
+    match = _FENCED_JSON.search(response) if "```" in response else None
+    if match:
+        try:
+            data = loads(match.group(1).strip())
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+
+    start = response.find("{")
+    while start != -1:
+        try:
+            data, _ = _DECODER.raw_decode(response, start)
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+        start = response.find("{", start + 1)
+
+    raise ValueError("No JSON found in response")
@@ -0,0 +1,133 @@
+"""
+Tests for CircuitBreaker state transitions
+"""
+import asyncio
+
+import pytest
+
+from app.agent.error_handling import CircuitBreaker, CircuitOpenError
+
+
+async def _fail():
+    raise RuntimeError("boom")
+
+
+async def _ok():
+    return "ok"
+
+
+async def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            await breaker.call(_fail)
+
+
+@pytest.mark.asyncio
+async def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60.0)
+    
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    assert breaker.state == "closed"
+    
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    assert breaker.state == "open"
+    
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_ok)
+
+
+@pytest.mark.asyncio
+async def test_success_resets_the_failure_streak():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60.0)
+    
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    assert await breaker.call(_ok) == "ok"
+    with pytest.raises(RuntimeError):
+        await breaker.call(_fail)
+    
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_success_closes():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+    await _trip(breaker)
+    
+    assert await breaker.call(_ok) == "ok"
+    assert breaker.state == "closed"
+    assert breaker.failure_count == 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=0.0)
+    await _trip(breaker)
+    
+    breaker.acquire()
+    assert breaker.state == "half-open"
+    breaker.record_failure()
+    
+    assert breaker.state == "open"
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+    
+    breaker.acquire()
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    
+    # A probe that ends without a verdict frees the slot
+    breaker.release()
+    breaker.acquire()
+    breaker.record_success()
+    
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_frees_the_slot():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+    
+    probe = asyncio.create_task(breaker.call(asyncio.sleep, 10))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    
+    assert breaker.state == "half-open"
+    assert await breaker.call(_ok) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_reset_closes_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60.0)
+    breaker.record_failure()
+    
+    breaker.reset()
+    
+    assert breaker.state == "closed"
+    breaker.acquire()
+
+
+@pytest.mark.asyncio
+async def test_errors_rejected_by_is_failure_count_as_success():
+    breaker = CircuitBreaker(
+        failure_threshold=1,
+        recovery_timeout=60.0,
+        is_failure=lambda error: not isinstance(error, ValueError)
+    )
+    
+    async def _bad_request():
+        raise ValueError("chat not found")
+    
+    with pytest.raises(ValueError):
+        await breaker.call(_bad_request)
+    
+    assert breaker.state == "closed"
+    assert breaker.failure_count == 0
@@ -0,0 +1,47 @@
+"""
+Tests for extracting JSON objects from LLM responses
+"""
+import pytest
+
+from app.utils.json_utils import extract_json
+
+
+def test_bare_object():
+    assert extract_json('  {"plan": "x", "is_complete": true}\n') == {"plan": "x", "is_complete": True}
+
+
+def test_fenced_block():
+    response = 'Here is the plan:\n```json\n{"plan": "x", "tool_calls": []}\n```\nDone.'
+    
+    assert extract_json(response) == {"plan": "x", "tool_calls": []}
+
+
+def test_object_inside_prose():
+    response = 'Sure! {"observation": "ok", "should_finish": true} Let me know.'
+    
+    assert extract_json(response) == {"observation": "ok", "should_finish": True}
+
+
+def test_skips_braces_that_are_not_json():
+    response = 'Use {name} as a placeholder. {"plan": "x"} and {trailing'
+    
+    assert extract_json(response) == {"plan": "x"}
+
+
+def test_nested_objects_and_braces_in_strings():
+    response = 'Result: {"plan": "use {braces}", "tool_calls": [{"tool": "t", "parameters": {"a": 1}}]}'
+    
+    assert extract_json(response) == {
+        "plan": "use {braces}",
+        "tool_calls": [{"tool": "t", "parameters": {"a": 1}}],
+    }
+
+
+def test_first_object_wins():
+    assert extract_json('{"a": 1} {"b": 2}') == {"a": 1}
+
+
+@pytest.mark.parametrize("response", ["", "no json here", "[1, 2, 3]", '{"unterminated": '])
+def test_raises_without_an_object(response):
+    with pytest.raises(ValueError):
+        extract_json(response)
@@ -0,0 +1,82 @@
+"""
+Tests for the planner cache keying and cacheability rules
+"""
+import pytest
+
+from app.agent.executor import READ_ONLY_TOOLS
+from app.agent.plan_cache import PlannerCache
+
+
+def _plan(*tools: str, is_complete: bool = False):
+    return {
+        "plan": "Look it up",
+        "is_complete": is_complete,
+        "tool_calls": [{"tool": tool, "parameters": {}} for tool in tools],
+    }
+
+
+async def _embed(text: str):
+    # Identical texts embed identically, so the similarity tier always matches
+    return [1.0, 0.0, 0.0]
+
+
+def test_key_depends_on_conversation_context():
+    context_a = [{"role": "user", "content": "Email Alice"}]
+    context_b = [{"role": "user", "content": "Email Bob"}]
+    
+    assert PlannerCache.make_key("yes", context=context_a) != PlannerCache.make_key("yes", context=context_b)
+    assert PlannerCache.make_key("yes", context=context_a) == PlannerCache.make_key("yes", context=list(context_a))
+
+
+def test_key_depends_on_observations_and_semantic_context():
+    base = PlannerCache.make_key("check my calendar")
+    
+    assert PlannerCache.make_key("check my calendar", observations=["done"]) != base
+    assert PlannerCache.make_key("check my calendar", semantic_context="Memory") != base
+
+
+def test_write_tool_plans_are_not_cacheable():
+    cache = PlannerCache(cacheable_tools=READ_ONLY_TOOLS)
+    
+    assert cache.is_cacheable(_plan("list_calendar_events"))
+    assert not cache.is_cacheable(_plan("send_email"))
+    assert not cache.is_cacheable(_plan("list_emails", "send_email"))
+    assert not cache.is_cacheable(_plan())
+    assert not cache.is_cacheable(_plan("list_emails", is_complete=True))
+
+
+@pytest.mark.asyncio
+async def test_put_skips_write_tool_plans():
+    cache = PlannerCache(embed_fn=_embed, cacheable_tools=READ_ONLY_TOOLS)
+    key = PlannerCache.make_key("send the report")
+    
+    await cache.put(key, _plan("send_email"), text="send the report")
+    
+    assert cache.get(key) is None
+    assert await cache.get_similar("send the report") is None
+
+
+@pytest.mark.asyncio
+async def test_exact_hit_returns_a_copy():
+    cache = PlannerCache(cacheable_tools=READ_ONLY_TOOLS)
+    key = PlannerCache.make_key("what's on today?")
+    
+    await cache.put(key, _plan("list_calendar_events"))
+    first = cache.get(key)
+    first["tool_calls"].clear()
+    
+    assert cache.get(key) == _plan("list_calendar_events")
+
+
+@pytest.mark.asyncio
+async def test_similar_hit_is_scoped_to_the_conversation():
+    cache = PlannerCache(embed_fn=_embed, cacheable_tools=READ_ONLY_TOOLS)
+    scope_a = PlannerCache.make_scope([{"role": "user", "content": "Find Alice's email"}])
+    scope_b = PlannerCache.make_scope([{"role": "user", "content": "Find Bob's email"}])
+    
+    await cache.put(
+        PlannerCache.make_key("yes"), _plan("list_emails"), text="yes", scope=scope_a
+    )
+    
+    assert await cache.get_similar("yes", scope_a) == _plan("list_emails")
+    assert await cache.get_similar("yes", scope_b) is None
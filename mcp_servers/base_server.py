@@ -2,33 +2,60 @@
 Base MCP Server Template
 Provides common functionality for all MCP servers
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, Any, List, Optional, Callable
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+import asyncio
+import importlib.util
+import os
+import sys
 
 
 class ToolRequest(BaseModel):
     """Standard tool execution request"""
+    model_config = ConfigDict(extra="ignore")
+    
     tool: str
     parameters: Dict[str, Any]
 
 
 class ToolResponse(BaseModel):
     """Standard tool execution response"""
+    model_config = ConfigDict(extra="ignore")
+    
     success: bool
     result: Any
     error: Optional[str] = None
 
 
+class ToolBatchRequest(BaseModel):
+    """Batch of tool execution requests"""
+    model_config = ConfigDict(extra="ignore")
+    
+    calls: List[ToolRequest]
+
+
 class ToolDefinition(BaseModel):
     """Tool definition for discovery"""
+    model_config = ConfigDict(extra="ignore")
+    
     name: str
     description: str
     parameters: List[Dict[str, Any]]
 
 
+def _error_response(error: str) -> ToolResponse:
+    """Failed tool execution response"""
+    return ToolResponse(
+        success=False,
+        result=None,
+        error=error
+    )
+
+
 class BaseMCPServer(ABC):
     """
     Base class for MCP servers
@@ -40,7 +67,8 @@ class BaseMCPServer(ABC):
         name: str,
         description: str,
         version: str = "1.0.0",
-        port: int = 8000
+        port: int = 8000,
+        app_import_path: Optional[str] = None
     ):
         """
         Initialize MCP server
@@ -50,17 +78,21 @@ class BaseMCPServer(ABC):
             description: Server description
             version: Server version
             port: Port to run on
+            app_import_path: Optional "module:attribute" of an app built with
+                create_app(), required to run more than one worker
         """
         self.name = name
         self.description = description
         self.version = version
         self.port = port
+        self.app_import_path = app_import_path
         
         # Create FastAPI app
         self.app = FastAPI(
             title=name,
             description=description,
-            version=version
+            version=version,
+            lifespan=self._lifespan
         )
         
         # Add CORS middleware
@@ -72,13 +104,29 @@ class BaseMCPServer(ABC):
             allow_headers=["*"],
         )
         
-        # Tool registry
-        self.tools: Dict[str, Callable] = {}
-        self.tool_definitions: List[ToolDefinition] = []
+        # Tool registry: name -> (handler, definition)
+        self.tools: Dict[str, Tuple[Callable, ToolDefinition]] = {}
+        # Serialized /tools response, rebuilt after a registration
+        self._tool_list: Optional[Dict[str, Any]] = None
+        # Set once create_app() has registered the tools
+        self._app_ready = False
         
         # Setup routes
         self._setup_routes()
     
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """Release server resources on shutdown"""
+        yield
+        await self.close()
+    
+    async def close(self):
+        """
+        Release resources held by the server (clients, sessions)
+        Called on shutdown; override in subclasses that hold any
+        """
+        pass
+    
     def _setup_routes(self):
         """Setup standard MCP routes"""
         
@@ -104,34 +152,51 @@ class BaseMCPServer(ABC):
         @self.app.get("/tools")
         async def list_tools():
             """List available tools"""
-            return {
-                "tools": [tool.dict() for tool in self.tool_definitions]
-            }
+            return self._get_tool_list()
         
         @self.app.post("/execute")
         async def execute_tool(request: ToolRequest):
             """Execute a tool"""
-            try:
-                if request.tool not in self.tools:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Tool '{request.tool}' not found"
-                    )
-                
-                # Execute tool
-                result = await self.tools[request.tool](request.parameters)
-                
-                return ToolResponse(
-                    success=True,
-                    result=result
-                )
-                
-            except Exception as e:
-                return ToolResponse(
-                    success=False,
-                    result=None,
-                    error=str(e)
-                )
+            return await self._execute(request)
+        
+        @self.app.post("/execute_batch")
+        async def execute_batch(request: ToolBatchRequest):
+            """Execute several tools concurrently"""
+            results = await asyncio.gather(
+                *(self._execute(call) for call in request.calls)
+            )
+            return {"results": results}
+    
+    async def _execute(self, request: ToolRequest) -> ToolResponse:
+        """Execute a single tool request"""
+        entry = self.tools.get(request.tool)
+        if entry is None:
+            return _error_response(f"Tool '{request.tool}' not found")
+        handler, _ = entry
+        
+        # Execute tool
+        try:
+            result = await handler(request.parameters)
+        except Exception as e:
+            return _error_response(str(e))
+        
+        return ToolResponse(
+            success=True,
+            result=result
+        )
+    
+    def _get_tool_list(self) -> Dict[str, Any]:
+        """The /tools response, serialized once per set of registered tools"""
+        if self._tool_list is None:
+            self._tool_list = {
+                "tools": [definition.model_dump() for _, definition in self.tools.values()]
+            }
+        return self._tool_list
+    
+    @property
+    def tool_definitions(self) -> List[ToolDefinition]:
+        """Definitions of the registered tools, in registration order"""
+        return [definition for _, definition in self.tools.values()]
     
     def register_tool(
         self,
@@ -149,14 +214,15 @@ class BaseMCPServer(ABC):
             parameters: List of parameter definitions
             handler: Async function to handle tool execution
         """
-        self.tools[name] = handler
-        self.tool_definitions.append(
+        self.tools[name] = (
+            handler,
             ToolDefinition(
                 name=name,
                 description=description,
                 parameters=parameters
             )
         )
+        self._tool_list = None
     
     @abstractmethod
     def setup_tools(self):
@@ -166,19 +232,60 @@ class BaseMCPServer(ABC):
         """
         pass
     
+    def create_app(self) -> FastAPI:
+        """
+        Register the tools and return the ASGI app
+        
+        Multi-worker deployments expose the result at module level, e.g.
+        ``app = MyServer(app_import_path="server:app").create_app()``, so
+        each worker process can import it. Calling it again returns the
+        same app without registering the tools twice.
+        """
+        if not self._app_ready:
+            self.setup_tools()
+            self._get_tool_list()
+            self._app_ready = True
+        return self.app
+    
     def run(self):
-        """Run the MCP server"""
+        """
+        Run the MCP server
+        
+        Uses uvloop and httptools when they are installed (uvloop is not
+        available on Windows). MCP_WORKERS > 1 starts several processes,
+        which needs app_import_path and is only safe for servers that keep
+        no state of their own in-process; of the bundled servers only the
+        Windows OS server sets it, and the rest fall back to one worker.
+        """
         import uvicorn
         
         # Setup tools before running
-        self.setup_tools()
+        self.create_app()
+        
+        workers = int(os.getenv("MCP_WORKERS", "1"))
+        if workers > 1 and not self.app_import_path:
+            print(f"⚠️  MCP_WORKERS={workers} needs app_import_path; running one worker")
+            workers = 1
+        
+        loop = "uvloop" if sys.platform != "win32" and _installed("uvloop") else "asyncio"
+        http = "httptools" if _installed("httptools") else "h11"
         
         print(f"🚀 Starting {self.name} on port {self.port}")
         print(f"📝 {len(self.tools)} tools registered")
+        print(f"⚙️  {workers} worker(s), {loop} loop, {http} parser")
         
         uvicorn.run(
-            self.app,
+            self.app_import_path if workers > 1 else self.app,
             host="0.0.0.0",
             port=self.port,
+            loop=loop,
+            http=http,
+            workers=workers,
+            access_log=False,
             log_level="info"
         )
+
+
+def _installed(module: str) -> bool:
+    """Whether an optional module can be imported"""
+    return importlib.util.find_spec(module) is not None
@@ -4,15 +4,25 @@ Provides tools for conversation storage, preferences, and interaction logging
 """
 import sys
 import os
+import asyncio
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from mcp_servers.base_server import BaseMCPServer
 from backend.app.memory.long_term import LongTermMemory
+from backend.app.utils.cache_utils import TTLCache
 from typing import Dict, Any
 
 
+# Cached user preferences; this server is their only writer
+PREFERENCES_CACHE_SIZE = 1024
+PREFERENCES_CACHE_TTL = 60.0
+
+# Distinguishes a cache miss from any cached preferences value
+_MISSING = object()
+
+
 class MemoryDBServer(BaseMCPServer):
     """
     MCP server for memory database operations
@@ -28,6 +38,11 @@ class MemoryDBServer(BaseMCPServer):
         
         # Initialize long-term memory
         self.memory = LongTermMemory()
+        
+        self._prefs_cache = TTLCache(PREFERENCES_CACHE_SIZE, PREFERENCES_CACHE_TTL)
+        # Per-user save counter; a read only fills the cache if no save
+        # finished while it was in flight
+        self._prefs_versions: Dict[str, int] = {}
     
     def setup_tools(self):
         """Register all memory database tools"""
@@ -95,6 +110,18 @@ class MemoryDBServer(BaseMCPServer):
             handler=self.get_task_history
         )
         
+        # Composite tools
+        self.register_tool(
+            name="get_user_context",
+            description="Get user preferences, recent conversations and task history in one call",
+            parameters=[
+                {"name": "user_id", "type": "string", "required": True},
+                {"name": "conversation_id", "type": "integer", "required": False},
+                {"name": "limit", "type": "integer", "required": False}
+            ],
+            handler=self.get_user_context
+        )
+        
         # Interaction logging tools
         self.register_tool(
             name="log_interaction",
@@ -125,19 +152,19 @@ class MemoryDBServer(BaseMCPServer):
         user_id = params["user_id"]
         messages = params["messages"]
         
-        # Create conversation
-        conv_id = self.memory.create_conversation(user_id)
-        
-        # Save messages
-        message_ids = []
-        for msg in messages:
-            msg_id = self.memory.save_message(
-                conversation_id=conv_id,
-                role=msg.get("role", "user"),
-                content=msg.get("content", ""),
-                metadata=msg.get("metadata")
-            )
-            message_ids.append(msg_id)
+        # Create conversation and save messages in one transaction, on one thread
+        conv_id, message_ids = await asyncio.to_thread(
+            self.memory.save_conversation,
+            user_id,
+            [
+                {
+                    "role": msg.get("role", "user"),
+                    "content": msg.get("content", ""),
+                    "metadata": msg.get("metadata")
+                }
+                for msg in messages
+            ]
+        )
         
         return {
             "conversation_id": conv_id,
@@ -150,7 +177,7 @@ class MemoryDBServer(BaseMCPServer):
         conversation_id = params["conversation_id"]
         limit = params.get("limit")
         
-        messages = self.memory.get_conversation_messages(conversation_id, limit)
+        messages = await asyncio.to_thread(self.memory.get_conversation_messages, conversation_id, limit)
         
         return {
             "conversation_id": conversation_id,
@@ -163,7 +190,7 @@ class MemoryDBServer(BaseMCPServer):
         user_id = params["user_id"]
         limit = params.get("limit", 10)
         
-        conversations = self.memory.get_user_conversations(user_id, limit)
+        conversations = await asyncio.to_thread(self.memory.get_user_conversations, user_id, limit)
         
         return {
             "user_id": user_id,
@@ -175,7 +202,12 @@ class MemoryDBServer(BaseMCPServer):
         """Get user preferences"""
         user_id = params["user_id"]
         
-        preferences = self.memory.get_user_preferences(user_id)
+        preferences = self._prefs_cache.get(user_id, _MISSING)
+        if preferences is _MISSING:
+            version = self._prefs_versions.get(user_id, 0)
+            preferences = await asyncio.to_thread(self.memory.get_user_preferences, user_id)
+            if self._prefs_versions.get(user_id, 0) == version:
+                self._prefs_cache.set(user_id, preferences)
         
         return {
             "user_id": user_id,
@@ -187,7 +219,9 @@ class MemoryDBServer(BaseMCPServer):
         user_id = params["user_id"]
         preferences = params["preferences"]
         
-        self.memory.save_user_preferences(user_id, preferences)
+        await asyncio.to_thread(self.memory.save_user_preferences, user_id, preferences)
+        self._prefs_versions[user_id] = self._prefs_versions.get(user_id, 0) + 1
+        self._prefs_cache.pop(user_id)
         
         return {
             "user_id": user_id,
@@ -200,20 +234,40 @@ class MemoryDBServer(BaseMCPServer):
         conversation_id = params.get("conversation_id")
         limit = params.get("limit", 10)
         
-        tasks = self.memory.get_task_history(conversation_id, limit)
+        tasks = await asyncio.to_thread(
+            self.memory.get_task_history,
+            conversation_id,
+            limit,
+            user_id=params.get("user_id")
+        )
         
         return {
             "tasks": tasks,
             "count": len(tasks)
         }
     
+    async def get_user_context(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Get preferences, conversations and task history concurrently"""
+        preferences, conversations, tasks = await asyncio.gather(
+            self.get_user_preferences(params),
+            self.get_user_conversations(params),
+            self.get_task_history(params)
+        )
+        
+        return {
+            "user_id": params["user_id"],
+            "preferences": preferences["preferences"],
+            "conversations": conversations["conversations"],
+            "tasks": tasks["tasks"]
+        }
+    
     async def log_interaction(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Log a user interaction"""
         user_id = params["user_id"]
         interaction_type = params["interaction_type"]
         metadata = params.get("metadata")
         
-        log_id = self.memory.log_interaction(user_id, interaction_type, metadata)
+        log_id = await asyncio.to_thread(self.memory.log_interaction, user_id, interaction_type, metadata)
         
         return {
             "log_id": log_id,
@@ -228,7 +282,7 @@ class MemoryDBServer(BaseMCPServer):
         interaction_type = params.get("interaction_type")
         limit = params.get("limit", 50)
         
-        logs = self.memory.get_interaction_logs(user_id, interaction_type, limit)
+        logs = await asyncio.to_thread(self.memory.get_interaction_logs, user_id, interaction_type, limit)
         
         return {
             "user_id": user_id,
@@ -4,13 +4,47 @@ Provides tools for Telegram bot integration
 """
 import sys
 import os
+import asyncio
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from mcp_servers.base_server import BaseMCPServer
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import os
+import time
+import httpx
+
+
+# Idle Bot API connections kept open for reuse
+TELEGRAM_MAX_KEEPALIVE = 20
+
+# Messages per second across all chats; the Bot API allows about 30
+TELEGRAM_MAX_SENDS_PER_SECOND = 25
+
+# Retries of a send the Bot API rejected with 429 Too Many Requests
+TELEGRAM_MAX_RETRIES = 3
+
+
+class RateLimiter:
+    """
+    Spaces calls evenly so no more than `rate` start per second
+    
+    Each caller reserves the next free slot and sleeps until it, so
+    concurrent senders are released one interval apart.
+    """
+    
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate
+        self._next_slot = 0.0
+    
+    async def wait(self) -> None:
+        """Sleep until this caller's slot"""
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
 
 
 class TelegramServer(BaseMCPServer):
@@ -32,6 +66,22 @@ class TelegramServer(BaseMCPServer):
         
         if not self.bot_token:
             print("⚠️  Warning: TELEGRAM_BOT_TOKEN not set")
+        
+        # One keep-alive client for every Bot API call, so only the first
+        # request pays for the TCP and TLS handshakes
+        self.client: Optional[httpx.AsyncClient] = None
+        if self.bot_token:
+            self.client = httpx.AsyncClient(
+                base_url=f"https://api.telegram.org/bot{self.bot_token}",
+                timeout=10,
+                limits=httpx.Limits(max_keepalive_connections=TELEGRAM_MAX_KEEPALIVE)
+            )
+        self._send_rate = RateLimiter(TELEGRAM_MAX_SENDS_PER_SECOND)
+    
+    async def close(self):
+        """Close the Bot API client"""
+        if self.client is not None:
+            await self.client.aclose()
     
     def setup_tools(self):
         """Register all Telegram tools"""
@@ -55,6 +105,17 @@ class TelegramServer(BaseMCPServer):
             handler=self.send_notification
         )
         
+        self.register_tool(
+            name="send_telegram_batch",
+            description="Send several messages via Telegram, in order within each chat",
+            parameters=[
+                {"name": "messages", "type": "array", "required": True},
+                {"name": "chat_id", "type": "string", "required": False},
+                {"name": "chat_ids", "type": "array", "required": False}
+            ],
+            handler=self.send_batch
+        )
+        
         self.register_tool(
             name="get_telegram_updates",
             description="Get recent Telegram updates",
@@ -83,13 +144,85 @@ class TelegramServer(BaseMCPServer):
                 "error": "No chat_id provided and no default chat_id configured"
             }
         
-        # TODO: Implement actual Telegram API call
-        # For now, return placeholder
+        return await self._post_one(message, chat_id)
+    
+    async def send_batch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send several messages
+        
+        Messages to the same chat are sent one after another in the given
+        order, so multi-part messages arrive intact; different chats are
+        sent to concurrently.
+        """
+        messages: List[str] = params["messages"]
+        chat_ids: List[Optional[str]] = params.get("chat_ids") or [params.get("chat_id")] * len(messages)
+        
+        if len(chat_ids) != len(messages):
+            return {
+                "success": False,
+                "error": "chat_ids must have one entry per message"
+            }
+        
+        by_chat: Dict[Optional[str], List[int]] = {}
+        for i, chat_id in enumerate(chat_ids):
+            by_chat.setdefault(chat_id or self.default_chat_id, []).append(i)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        
+        async def send_chat(chat_id: Optional[str], indices: List[int]) -> None:
+            for i in indices:
+                results[i] = await self.send_message({"message": messages[i], "chat_id": chat_id})
+        
+        await asyncio.gather(*(
+            send_chat(chat_id, indices) for chat_id, indices in by_chat.items()
+        ))
+        sent = sum(1 for result in results if result["success"])
+        
+        return {
+            "success": sent == len(results),
+            "results": results,
+            "sent": sent,
+            "failed": len(results) - sent
+        }
+    
+    async def _post_one(self, message: str, chat_id: str) -> Dict[str, Any]:
+        """
+        Post one message to the Bot API within the global send rate
+        
+        A 429 reply is retried after the retry_after seconds it names.
+        """
+        for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+            await self._send_rate.wait()
+            try:
+                response = await self.client.post(
+                    "/sendMessage",
+                    json={"chat_id": chat_id, "text": message}
+                )
+                data = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                return {
+                    "success": False,
+                    "error": f"Telegram API request failed: {e}"
+                }
+            
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+            if response.status_code != 429 or not retry_after or attempt == TELEGRAM_MAX_RETRIES:
+                break
+            await asyncio.sleep(retry_after)
+        
+        # The Bot API reports failures in the body along with a 4xx status
+        if not data.get("ok"):
+            return {
+                "success": False,
+                "error": data.get("description", f"HTTP {response.status_code}")
+            }
+        
         return {
             "success": True,
             "message": message,
             "chat_id": chat_id,
-            "status": "sent (placeholder - implement Telegram API)"
+            "message_id": data["result"]["message_id"],
+            "status": "sent"
         }
     
     async def send_notification(self, params: Dict[str, Any]) -> Dict[str, Any]:
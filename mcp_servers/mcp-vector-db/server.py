@@ -4,15 +4,21 @@ Provides tools for semantic search and RAG
 """
 import sys
 import os
+import asyncio
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../..'))
 
 from mcp_servers.base_server import BaseMCPServer
 from backend.app.memory.semantic import SemanticMemory
+from backend.app.utils.cache_utils import TTLCache
 from typing import Dict, Any
 
 
+# Seconds a memory count is reused between writes through this server
+MEMORY_COUNT_TTL = 5.0
+
+
 class VectorDBServer(BaseMCPServer):
     """
     MCP server for vector database operations
@@ -28,6 +34,12 @@ class VectorDBServer(BaseMCPServer):
         
         # Initialize semantic memory
         self.memory = SemanticMemory()
+        
+        self._count_cache = TTLCache(maxsize=1, ttl=MEMORY_COUNT_TTL)
+    
+    async def close(self):
+        """Release the semantic memory's I/O threads and Ollama client"""
+        await self.memory.close()
     
     def setup_tools(self):
         """Register all vector database tools"""
@@ -112,6 +124,7 @@ class VectorDBServer(BaseMCPServer):
         memory_id = params.get("memory_id")
         
         result_id = await self.memory.add_memory(text, metadata, memory_id)
+        self._count_cache.clear()
         
         return {
             "memory_id": result_id,
@@ -143,8 +156,8 @@ class VectorDBServer(BaseMCPServer):
         
         return {
             "query": query,
-            "context": context,
-            "has_context": context != "No relevant context found."
+            "context": context.text,
+            "has_context": context.has_context
         }
     
     async def add_conversation_to_memory(self, params: Dict[str, Any]) -> Dict[str, Any]:
@@ -158,6 +171,7 @@ class VectorDBServer(BaseMCPServer):
             messages,
             user_id
         )
+        self._count_cache.clear()
         
         return {
             "conversation_id": conversation_id,
@@ -181,15 +195,16 @@ class VectorDBServer(BaseMCPServer):
         return {
             "conversation_id": conversation_id,
             "query": query,
-            "context": context,
-            "has_context": context != "No relevant context found."
+            "context": context.text,
+            "has_context": context.has_context
         }
     
     async def delete_memory(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Delete a specific memory"""
         memory_id = params["memory_id"]
         
-        self.memory.delete_memory(memory_id)
+        await asyncio.to_thread(self.memory.delete_memory, memory_id)
+        self._count_cache.clear()
         
         return {
             "memory_id": memory_id,
@@ -198,7 +213,10 @@ class VectorDBServer(BaseMCPServer):
     
     async def get_memory_count(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Get total number of memories"""
-        count = self.memory.get_memory_count()
+        count = self._count_cache.get("total")
+        if count is None:
+            count = await asyncio.to_thread(self.memory.get_memory_count)
+            self._count_cache.set("total", count)
         
         return {
             "total_memories": count
@@ -23,7 +23,8 @@ class WindowsOSServer(BaseMCPServer):
             name="MCP Windows OS Server",
             description="Provides Windows automation and system control",
             version="1.0.0",
-            port=8006
+            port=8006,
+            app_import_path="server:app"
         )
         
         # Check if running on Windows
@@ -400,6 +401,10 @@ class WindowsOSServer(BaseMCPServer):
             return {"success": False, "error": str(e)}
 
 
+server = WindowsOSServer()
+# Importable by each worker process when MCP_WORKERS > 1
+app = server.create_app()
+
+
 if __name__ == "__main__":
-    server = WindowsOSServer()
     server.run()